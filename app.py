@@ -3,23 +3,25 @@ import re
 import os
 import argparse
 import locale
-from playwright.async_api import async_playwright
-from playwright._impl._errors import TargetClosedError
-from datetime import datetime, time, timedelta
-from google_calendar import get_calendar_service, create_event, get_events, update_event, delete_event
-import dateparser
+import random
+from datetime import date, datetime, time, timedelta
+from time import perf_counter
+from import_profile import ImportProfiler
+from run_profiler import RunProfiler
+from metrics import metrics
+from run_lock import RunLock
+from adaptive_timeout import AdaptiveTimeout
+from resource_blocker import ResourceBlocker, BLOCKED_RESOURCE_TYPES, TELEMETRY_HOSTS
+from outlook_capture import OutlookResponseCapture
+from meeting import Meeting
+from html_description import normalize_description
+from meeting_filter import ScrapeFilter, get_ignore_matcher, split_cancelled, is_participant
+from date_parsing import parse_date_string, parse_time_string
+from scrape_cache import ScrapeCache
+from fixtures import FixtureRecorder
+from sync_state import SyncState, meeting_fingerprint, canonical_meeting, canonical_google_event, content_hash, changed_fields, stored_hash, HASH_PROPERTY
 import json
-
-def parse_date_string(date_str):
-    """
-    Parses a date string that could be in English or French format using the dateparser library.
-    """
-    # The dateparser library can automatically handle various formats and locales.
-    # It will return a datetime object if successful, or None if it fails.
-    parsed_date = dateparser.parse(date_str)
-    if parsed_date:
-        return parsed_date.date()
-    return None
+from concurrent.futures import ThreadPoolExecutor
 
 def load_user_config(email=None):
     """
@@ -63,7 +65,7 @@ def load_user_config(email=None):
             ignore_list_from_file = [line.strip() for line in f if line.strip()]
 
         # Add to config's ignore_list, avoiding duplicates
-        existing_ignores = set(config.get("ignore_list", []))
+        existing_ignores = {item for item in config.get("ignore_list", []) if isinstance(item, str)}
         new_ignores = [item for item in ignore_list_from_file if item not in existing_ignores]
         config["ignore_list"].extend(new_ignores)
 
@@ -79,274 +81,847 @@ def load_user_config(email=None):
 
     return config
 
-async def get_meetings(freq='week'):
+def get_state_path(name):
     """
-    Fetch meetings from Outlook calendar using Playwright.
+    Returns the path of a file CalSync keeps between runs (caches, sync state).
+    """
+    return name
+
+def meeting_key(title, date_str, start_time_str, end_time_str):
+    """
+    Returns a key identifying a meeting independently of the locale its date and
+    times were rendered in, or None if they can't be parsed.
+    """
+    try:
+        return (title, parse_date_string(date_str), parse_time_string(start_time_str), parse_time_string(end_time_str))
+    except ValueError:
+        return None
+
+def get_date_slices(freq, today=None):
+    """
+    Splits a calendar view into smaller views that can be scraped side by side:
+    a week into its days and a month into its weeks. A day can't be split.
+
+    Returns:
+        list: (view, date) tuples, where view is 'day' or 'week'.
+    """
+    today = today or date.today()
+    if freq == 'week':
+        week_start = today - timedelta(days=today.weekday())
+        return [('day', week_start + timedelta(days=i)) for i in range(7)]
+    if freq == 'month':
+        month_start = today.replace(day=1)
+        week_start = month_start - timedelta(days=month_start.weekday())
+        slices = []
+        while week_start.month == month_start.month or week_start < month_start:
+            slices.append(('week', week_start))
+            week_start += timedelta(days=7)
+        return slices
+    return [(freq, None)]
+
+# Outlook redirects to these when the session has expired
+LOGIN_HOSTS = ("login.microsoftonline.com", "login.live.com", "login.microsoft.com")
+
+def calendar_url(view, day=None):
+    """Returns the Outlook calendar URL for a view, optionally anchored on a given date."""
+    url = "https://outlook.office.com/calendar/view/" + view
+    if day:
+        url += f"/{day.year}/{day.month}/{day.day}"
+    return url
+
+def get_sync_window(freq, today=None):
+    """
+    Returns the (first, last) dates shown by a calendar view, with a week of margin on
+    each side since the first day of the week depends on the Outlook settings.
+    """
+    today = today or date.today()
+    slices = get_date_slices(freq, today)
+    first_view, first_day = slices[0]
+    last_view, last_day = slices[-1]
+    if first_day is None:
+        first_day = last_day = today
+    if last_view == 'week':
+        last_day += timedelta(days=6)
+    return first_day - timedelta(days=7), last_day + timedelta(days=7)
+
+# Resolves once the number of elements matching a selector hasn't changed for `quiet`
+# milliseconds, or once none showed up for `appear` milliseconds, with the delay
+# after which the first one showed up (or null).
+ELEMENTS_SETTLED = """([selector, token, appear, quiet]) => {
+    const now = performance.now();
+    let state = window.__calsyncSettle;
+    if (!state || state.token !== token) {
+        state = window.__calsyncSettle = {token, count: 0, changed: now, start: now, first: null};
+    }
+    const count = document.querySelectorAll(selector).length;
+    if (count !== state.count) {
+        state.count = count;
+        state.changed = now;
+        if (count && state.first === null) state.first = now - state.start;
+    }
+    if (!count) return now - state.start >= appear ? {count, first: state.first} : false;
+    return now - state.changed >= quiet ? {count, first: state.first} : false;
+}"""
+
+# How long the participant list must stay unchanged to be considered complete, in milliseconds
+PARTICIPANTS_QUIET = 500
+
+# How long a loaded calendar may take to render its events, in milliseconds
+EVENTS_RENDER_TIMEOUT = 3000
+
+def new_event_timeouts():
+    """
+    Returns the adaptive timeouts of the waits done while opening an event, starting
+    from the fixed timeouts used before any latency is known.
+    """
+    return {
+        "view_event": AdaptiveTimeout(5000),
+        "description": AdaptiveTimeout(3000),
+        # How long to wait for the first participant before taking the list as empty
+        "participants": AdaptiveTimeout(3000, floor=1000),
+        "close": AdaptiveTimeout(2000),
+    }
+
+async def scrape_calendar_view(page, url, label, capture_mode='network', timeout=120000, login_timeout=None, cache=None, on_meeting=None, timeouts=None,
+                               load_stage='outlook.view_load', prefilter=None, description_max_bytes=0):
+    """
+    Opens a calendar view in the given page and scrapes the meetings it shows.
 
     Args:
-        freq (str): Frequency of the calendar view ('day', 'week' or 'month'). Default is 'week'.
+        page: The Playwright page to use.
+        url (str): The calendar view URL.
+        label (str): Describes the view in log messages (e.g. 'this week').
+        capture_mode (str): 'network' to read details from the page's responses first, 'dom' to open every event.
+        timeout (int): How long to wait for the calendar to show up, in milliseconds.
+        login_timeout (int, optional): If set, first wait this long for the user to be back on the calendar after logging in.
+        cache (ScrapeCache, optional): Details of events scraped on previous runs, reused instead of opening the event.
+        on_meeting (callable, optional): Called with each meeting as soon as it is scraped.
+        timeouts (dict, optional): Adaptive timeouts from new_event_timeouts(), shared between views.
+        load_stage (str): Name of the span timing how long the view took to show its events,
+            'outlook.login_wait' for the view the user logs in on.
+        prefilter (ScrapeFilter, optional): Drops the events that don't need to be opened, from their aria-label.
+        description_max_bytes (int): Size descriptions are cut to, 0 to keep them whole.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents a meeting.
+        list: The Meeting records scraped from the view.
     """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+    timeouts = timeouts or new_event_timeouts()
     meetings_data = []
+
+    def add(meeting):
+        meetings_data.append(meeting)
+        if on_meeting:
+            on_meeting(meeting)
+
+    capture = None
+    if capture_mode == "network":
+        capture = OutlookResponseCapture()
+        capture.attach(page)
+
     try:
-        async with async_playwright() as p:
-            user_data_dir = "./user_data"
-            if not os.path.exists(user_data_dir):
-                os.makedirs(user_data_dir)
+        with metrics.span(load_stage, view=label) as span:
+            await page.goto(url)
+            if login_timeout:
+                await page.wait_for_url("https://outlook.office.com/calendar/**", timeout=login_timeout)
 
-            context = await p.chromium.launch_persistent_context(user_data_dir, headless=False)
-            page = await context.new_page()
+            # Wait for the calendar to load (and for the user to log in on the first view),
+            # then briefly for its events, so a view without any doesn't take the whole timeout
+            try:
+                await page.wait_for_selector("[role='main']", timeout=timeout)
+                await page.wait_for_selector(".calendar-SelectionStyles-resizeBoxParent", timeout=EVENTS_RENDER_TIMEOUT)
+            except PlaywrightTimeoutError:
+                span["empty"] = True
+                print(f"No meetings found {label}.")
+                return meetings_data
 
-            print("Please log in to your Outlook account in the browser window if required...")
-            await page.goto("https://outlook.office.com/calendar/view/" + freq)
+        meeting_elements = await page.query_selector_all(".calendar-SelectionStyles-resizeBoxParent")
 
-            # Wait for the user to log in and the calendar to load
-            await page.wait_for_selector(".calendar-SelectionStyles-resizeBoxParent", timeout=120000) # 2 minutes timeout
+        print(f"Found {len(meeting_elements)} meetings {label}.")
 
-            meeting_elements = await page.query_selector_all(".calendar-SelectionStyles-resizeBoxParent")
+        captured_keys = set()
+        if capture is not None:
+            # Give the calendar a moment to finish its own data requests
+            await capture.settled()
+            for meeting in capture.meetings(with_description_only=True):
+                meeting.description = normalize_description(meeting.description, description_max_bytes)
+                add(meeting)
+                metrics.count("outlook.events", source="network")
+                captured_keys.add(meeting_key(meeting.title, meeting.date, meeting.start_time, meeting.end_time))
+            if meetings_data:
+                print(f"Captured {len(meetings_data)} meetings {label} from the calendar's network responses.")
+            else:
+                print("No meeting details captured from network responses, opening each event instead...")
 
-            print(f"Found {len(meeting_elements)} meetings this {freq}.")
+        for meeting_element in meeting_elements:
+            button = await meeting_element.query_selector("div[role='button']")
+            if not button:
+                continue
 
-            for meeting_element in meeting_elements:
-                try:
-                    button = await meeting_element.query_selector("div[role='button']")
-                    if not button:
-                        continue
+            # Read original event details from the button's aria-label
+            aria_label = await button.get_attribute("aria-label")
+            if not aria_label:
+                continue
+            # Regex to handle English ('to') and French ('à') time separators.
+            # This version is more robust and handles commas in the title and different date formats.
+            match = re.match(r"(.*?),\s*(\d{1,2}:\d{2}(?: [AP]M)?)\s*(?:to|à)\s*(\d{1,2}:\d{2}(?: [AP]M)?),\s*(\w+,\s+\w+\s+\d{1,2},\s+\d{4}|\w+\s+\d{1,2}\s+\w+\s+\d{4})", aria_label)
+            if not match:
+                continue
+            title = match.group(1).strip()
+            start_time = match.group(2).strip()
+            end_time = match.group(3).strip()
+            date_str = match.group(4).strip()
+
+            # Already known from the network responses, no need to open it
+            if captured_keys and meeting_key(title, date_str, start_time, end_time) in captured_keys:
+                continue
+
+            # Ignored, cancelled or past, as far as the aria-label tells
+            if prefilter:
+                reason, message = prefilter.check(title, date_str, start_time)
+                if reason:
+                    print(message)
+                    metrics.count("outlook.events", source=reason)
+                    if reason == "cancelled":
+                        add(Meeting(title=title, date=date_str, start_time=start_time, end_time=end_time, cancelled=True))
+                    continue
+
+            # Unchanged since a previous run, reuse the details scraped back then
+            fingerprint = ScrapeCache.fingerprint(title, start_time, end_time, date_str)
+            cached = cache.get(fingerprint) if cache else None
+            if cached:
+                metrics.count("outlook.events", source="cache")
+                add(Meeting(
+                    title=title,
+                    date=date_str,
+                    start_time=start_time,
+                    end_time=end_time,
+                    description=cached["description"],
+                    participants=list(cached["participants"])
+                ))
+                continue
+
+            event_start = perf_counter()
+            try:
+                # 1. Click event to open preview
+                await button.click()
+
+                # 2. Click "View event" to open full details, supporting English and French
+                view_event_selector = "button[aria-label='View event'], button[aria-label='Afficher l’événement']"
+                view_event_button = await timeouts["view_event"].wait(
+                    lambda t: page.wait_for_selector(view_event_selector, timeout=t)
+                )
+                # 3. Scrape description and participants
+                participants = []
+                description = ""
+                if view_event_button:
+                    await view_event_button.click()
+
+                    # Scrape description, as soon as the body is in the page
+                    description_selector = "div[id^='UniqueMessageBody_']"
+                    description_element = await timeouts["description"].wait(
+                        lambda t: page.wait_for_selector(description_selector, state="attached", timeout=t)
+                    )
+                    description = await description_element.inner_html() if description_element else ""
+
+                    # Scrape participants, once the list stopped changing (it may be empty)
+                    try:
+                        participants_selector = "span.fui-Persona__primaryText"
+                        appear = timeouts["participants"].timeout()
+                        settled = await page.wait_for_function(
+                            ELEMENTS_SETTLED, arg=[participants_selector, random.random(), appear, PARTICIPANTS_QUIET],
+                            timeout=appear + PARTICIPANTS_QUIET + 5000
+                        )
+                        first = (await settled.json_value())["first"]
+                        # Only lists that showed up tell how long they take to load
+                        if first is not None:
+                            timeouts["participants"].record(first)
+                        participant_elements = await page.query_selector_all(participants_selector)
+                        for p_element in participant_elements:
+                            email = await p_element.inner_text()
+                            if email:
+                                participants.append(email.strip())
+                    except Exception:
+                        # It's okay if we can't find participants, we can proceed without them
+                        pass
+
+                description = normalize_description(description, description_max_bytes)
+                add(Meeting(
+                    title=title,
+                    date=date_str,
+                    start_time=start_time,
+                    end_time=end_time,
+                    description=description,
+                    participants=participants
+                ))
+                # An empty list may have been too late to show up, so it's read again next time
+                if cache and participants:
+                    cache.put(fingerprint, description, participants)
+                metrics.count("outlook.events", source="opened")
+
+            except Exception as e:
+                metrics.count("outlook.events", source="failed")
+                print(f"Could not process an event, skipping. Error: {e}")
+            finally:
+                # 4. Close the details view to go back, supporting English and French
+                close_button_selector = "button[aria-label='Close'], button[aria-label='Fermer']"
+                close_button = await page.query_selector(close_button_selector)
+                if close_button:
+                    await close_button.click()
+                    # Make sure the modal is gone (its close button hidden or removed) before the next iteration
+                    try:
+                        await timeouts["close"].wait(
+                            lambda t: close_button.wait_for_element_state("hidden", timeout=t)
+                        )
+                    except Exception:
+                        pass
+                # From the click to the details view being closed
+                metrics.record("outlook.event", perf_counter() - event_start, view=label)
 
-                    # 1. Click event to open preview
-                    await button.click()
-
-                    # 2. Click "View event" to open full details, supporting English and French
-                    view_event_selector = "button[aria-label='View event'], button[aria-label='Afficher l’événement']"
-                    await page.wait_for_selector(view_event_selector, timeout=5000)
-                    view_event_button = await page.query_selector(view_event_selector)
-                    # 3. Scrape description and participants
-                    participants = []
-                    description = ""
-                    if view_event_button:
-                        await view_event_button.click()
-
-                        # Scrape description
-                        description_selector = "div[id^='UniqueMessageBody_']"
-                        await page.wait_for_selector(description_selector, timeout=3000)
-                        description_element = await page.query_selector(description_selector)
-                        description = await description_element.inner_html() if description_element else ""
-
-                        # Scrape participants
-                        try:
-                            participants_selector = "span.fui-Persona__primaryText"
-                            # Wait for participants to be visible
-                            await page.wait_for_selector(participants_selector, timeout=2000)
-                            participant_elements = await page.query_selector_all(participants_selector)
-                            for p_element in participant_elements:
-                                email = await p_element.inner_text()
-                                if email:
-                                    participants.append(email.strip())
-                        except Exception:
-                            # It's okay if we can't find participants, we can proceed without them
-                            pass
-
-                    # Clean the HTML description
-                    if description:
-                        # 1. Replace all div and p tags (and their closing tags) with a single line break.
-                        # This handles complex tags like <div class="..."> or <p style="...">
-                        description = re.sub(r'</?p.*?>', '<br>', description, flags=re.IGNORECASE)
-                        description = re.sub(r'</?div.*?>', '<br>', description, flags=re.IGNORECASE)
-
-                        # 2. Collapse any instance of multiple (two or more) line breaks into just one.
-                        description = re.sub(r'(<br\s*/?>\s*){2,}', '<br>', description)
-
-                        # 3. Remove any leading or trailing line breaks that might be left.
-                        description = description.strip().strip('<br>').strip()
-
-                    # Scrape original event details from the button's aria-label
-                    aria_label = await button.get_attribute("aria-label")
-                    if aria_label:
-                        # Regex to handle English ('to') and French ('à') time separators.
-                        # This version is more robust and handles commas in the title and different date formats.
-                        match = re.match(r"(.*?),\s*(\d{1,2}:\d{2}(?: [AP]M)?)\s*(?:to|à)\s*(\d{1,2}:\d{2}(?: [AP]M)?),\s*(\w+,\s+\w+\s+\d{1,2},\s+\d{4}|\w+\s+\d{1,2}\s+\w+\s+\d{4})", aria_label)
-                        if match:
-                            title = match.group(1).strip()
-                            start_time = match.group(2).strip()
-                            end_time = match.group(3).strip()
-                            date_str = match.group(4).strip()
-
-                            meetings_data.append({
-                                "title": title,
-                                "date": date_str,
-                                "start_time": start_time,
-                                "end_time": end_time,
-                                "description": description,
-                                "participants": participants
-                            })
-
-                except Exception as e:
-                    print(f"Could not process an event, skipping. Error: {e}")
-                finally:
-                    # 4. Close the details view to go back, supporting English and French
-                    close_button_selector = "button[aria-label='Close'], button[aria-label='Fermer']"
-                    close_button = await page.query_selector(close_button_selector)
-                    if close_button:
-                        await close_button.click()
-                        # Add a small delay to ensure the modal is closed before the next iteration
-                        await page.wait_for_timeout(500)
-
-
-            await context.close()
         return meetings_data
+    finally:
+        # The page may be reused for other views
+        if capture is not None:
+            capture.detach(page)
+
+async def session_is_authenticated(context, timeout=30000):
+    """
+    Tells whether the Outlook session stored in the browser profile is still logged in,
+    by opening the calendar and checking whether Outlook redirects to the login page.
+    """
+    page = await context.new_page()
+    try:
+        await page.goto(calendar_url("week"), wait_until="domcontentloaded")
+        # Whichever comes first: the login page, or the calendar's main region
+        login = asyncio.ensure_future(page.wait_for_url(lambda url: any(host in url for host in LOGIN_HOSTS), timeout=timeout))
+        calendar = asyncio.ensure_future(page.wait_for_selector("[role='main']", timeout=timeout))
+        done, pending = await asyncio.wait([login, calendar], return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        return calendar in done and calendar.exception() is None and not any(host in page.url for host in LOGIN_HOSTS)
+    except Exception as e:
+        print(f"Could not check the Outlook session: {e}")
+        return False
+    finally:
+        await page.close()
+
+async def launch_browser(playwright, headless="auto"):
+    """
+    Opens Chromium with the persistent profile that keeps the Outlook session.
+
+    Args:
+        playwright (Playwright): The running Playwright instance.
+        headless (bool or str): Whether to hide the browser window. With 'auto', the browser
+            is hidden as long as the stored session is logged in, and only shown when the
+            user has to log in.
+
+    Returns:
+        tuple: The browser context, and whether it is headless.
+    """
+    user_data_dir = "./user_data"
+    if not os.path.exists(user_data_dir):
+        os.makedirs(user_data_dir)
+
+    if headless == "auto":
+        with metrics.span("browser.launch", headless=True):
+            context = await playwright.chromium.launch_persistent_context(user_data_dir, headless=True)
+        with metrics.span("outlook.session_check") as span:
+            span["authenticated"] = authenticated = await session_is_authenticated(context)
+        if authenticated:
+            print("Outlook session is still valid, scraping without a browser window.")
+            return context, True
+        # A profile can only be used by one browser at a time
+        await context.close()
+        print("Outlook login required, opening a browser window...")
+        headless = False
+
+    with metrics.span("browser.launch", headless=bool(headless)):
+        context = await playwright.chromium.launch_persistent_context(user_data_dir, headless=bool(headless))
+    return context, bool(headless)
+
+async def scrape_meetings(on_meeting, freq='week', user_config=None, context=None):
+    """
+    Fetch meetings from Outlook calendar using Playwright.
+
+    By default the meetings are built from the JSON responses the calendar page
+    loads by itself ('capture_mode': 'network' in the config). Events whose details
+    weren't part of those responses, or all events when nothing could be captured,
+    are opened one by one in the page ('capture_mode': 'dom').
+
+    With 'max_pages' above 1 in the config, a week is scraped day by day and a month
+    week by week, using up to that many pages of the browser concurrently.
+
+    The details of opened events are cached for 'cache_ttl_hours' (12 by default,
+    0 disables the cache), so unchanged events aren't opened again on the next run.
+
+    Descriptions are cut to 'description_max_bytes' bytes, if set.
+
+    Ignored, past and cancelled events aren't opened, their title and time being
+    enough to skip them, unless 'scrape_prefilter' is false.
+
+    Images, media, fonts and telemetry aren't loaded, unless 'block_resources' is
+    false. 'blocked_resource_types' replaces the blocked types, and 'blocked_hosts'
+    adds hosts to the blocked ones.
+
+    If the browser window is closed, the scraping stops and the meetings already
+    handed to on_meeting are kept.
+
+    Args:
+        on_meeting (callable): Called with each Meeting as soon as it is scraped.
+        freq (str): Frequency of the calendar view ('day', 'week' or 'month'). Default is 'week'.
+        user_config (dict, optional): User configuration with scraping settings.
+        context (BrowserContext, optional): Browser to scrape with, left open. By default
+            a browser is launched for this scraping only.
+    """
+    user_config = user_config or {}
+    capture_mode = user_config.get("capture_mode", "network")
+    max_pages = max(1, int(user_config.get("max_pages", 1)))
+    slice_timeout = int(user_config.get("slice_timeout", 15000))
+    cache_ttl_hours = float(user_config.get("cache_ttl_hours", 12))
+    cache = ScrapeCache(get_state_path("scrape_cache.json"), cache_ttl_hours) if cache_ttl_hours > 0 else None
+    # Saves the scraped meetings as a fixture for the offline benchmarks, see fixtures.py
+    recorder = FixtureRecorder(user_config["record_fixture"]) if user_config.get("record_fixture") else None
+    # Built from the same ignore list as the sync. A recorded fixture keeps every event.
+    prefilter = ScrapeFilter(user_config.get("ignore_list", [])) if user_config.get("scrape_prefilter", True) and not recorder else None
+    description_max_bytes = int(user_config.get("description_max_bytes", 0))
+    # Playwright is only loaded once the browser is actually needed
+    from playwright.async_api import async_playwright
+    from playwright._impl._errors import TargetClosedError
+
+    # Views can overlap, each meeting is only handed over once
+    seen_keys = set()
+
+    def emit(meeting):
+        try:
+            # Parsed once here, the sync reuses the values kept on the record
+            meeting.parse()
+            key = (meeting.title, meeting.meeting_date, meeting.start, meeting.end)
+        except ValueError:
+            key = None
+        if key is not None and key in seen_keys:
+            return
+        seen_keys.add(key)
+        if recorder:
+            recorder.add(meeting)
+        on_meeting(meeting)
+
+    # Shared by every view and page, so the waits adapt over the whole scraping
+    timeouts = new_event_timeouts()
+
+    async def scrape(context):
+        blocker = None
+        if user_config.get("block_resources", True):
+            blocker = ResourceBlocker(
+                user_config.get("blocked_resource_types", BLOCKED_RESOURCE_TYPES),
+                TELEMETRY_HOSTS + tuple(user_config.get("blocked_hosts", []))
+            )
+            await blocker.attach(context)
+
+        page = await context.new_page()
+        pages = [page]
+
+        slices = get_date_slices(freq) if max_pages > 1 else [(freq, None)]
+        labels = [f"this {freq}" if day is None else f"in the {view} of {day}" for view, day in slices]
+
+        print("Please log in to your Outlook account in the browser window if required...")
+        # The first view is scraped alone, it's the one waiting for the user to log in
+        if len(slices) == 1:
+            await scrape_calendar_view(page, calendar_url(*slices[0]), labels[0], capture_mode, cache=cache, on_meeting=emit, timeouts=timeouts,
+                                       load_stage="outlook.login_wait", prefilter=prefilter, description_max_bytes=description_max_bytes)
+        else:
+            await scrape_calendar_view(page, calendar_url(*slices[0]), labels[0], capture_mode,
+                                       timeout=slice_timeout, login_timeout=120000, cache=cache, on_meeting=emit, timeouts=timeouts,
+                                       load_stage="outlook.login_wait", prefilter=prefilter, description_max_bytes=description_max_bytes)
+
+        remaining = asyncio.Queue()
+        for view_slice, label in zip(slices[1:], labels[1:]):
+            remaining.put_nowait((view_slice, label))
+
+        async def scrape_remaining(worker_page):
+            while not remaining.empty():
+                view_slice, label = remaining.get_nowait()
+                await scrape_calendar_view(worker_page, calendar_url(*view_slice), label, capture_mode,
+                                           timeout=slice_timeout, cache=cache, on_meeting=emit, timeouts=timeouts, prefilter=prefilter,
+                                           description_max_bytes=description_max_bytes)
+
+        if not remaining.empty():
+            pages += [await context.new_page() for _ in range(min(max_pages, remaining.qsize()) - 1)]
+            print(f"Scraping {remaining.qsize()} more calendar views with {len(pages)} pages...")
+            await asyncio.gather(*(scrape_remaining(worker_page) for worker_page in pages))
+
+        # The browser may stay open for the next sync, don't leave tabs behind
+        for worker_page in pages:
+            await worker_page.close()
+        if blocker:
+            await blocker.detach()
+            print(blocker.summary())
+        if timeouts["view_event"].samples:
+            print("Event waits: " + ", ".join(f"{name} {wait.summary()}" for name, wait in timeouts.items()))
+
+    try:
+        if context is not None:
+            await scrape(context)
+        else:
+            async with async_playwright() as p:
+                context, _ = await launch_browser(p, user_config.get("headless", "auto"))
+                await scrape(context)
+                await context.close()
+        if cache:
+            if cache.hits:
+                print(f"Reused the details of {cache.hits} unchanged meetings from the scrape cache.")
+            cache.save()
     except TargetClosedError:
-        print("\nWindow closed. Outlook sync process interrupted.")
-        return [] # Return an empty list to exit cleanly
+        print("\nWindow closed. Outlook sync process interrupted, the meetings scraped so far are kept.")
+        if cache:
+            # Keep what was scraped so far, the next run won't have to open those events again
+            cache.save()
+    finally:
+        if recorder:
+            recorder.save()
 
-def update_meetings(meetings_data, user_config=None):
+async def iter_meetings(freq='week', user_config=None, context=None):
     """
-    Updates the Google Calendar with the provided meeting data.
+    Fetch meetings from Outlook calendar, yielding each Meeting as soon as it is scraped.
+    See scrape_meetings for the settings read from user_config.
 
     Args:
-        meetings_data (list): A list of meeting dictionaries from get_meetings.
+        freq (str): Frequency of the calendar view ('day', 'week' or 'month'). Default is 'week'.
+        user_config (dict, optional): User configuration with scraping settings.
+        context (BrowserContext, optional): Browser to scrape with, left open.
     """
+    queue = asyncio.Queue()
+    # The scraping runs on its own, so it doesn't wait for the consumer of each meeting
+    scraper = asyncio.create_task(scrape_meetings(queue.put_nowait, freq, user_config, context))
+    scraper.add_done_callback(lambda _: queue.put_nowait(None))
+    try:
+        while (meeting := await queue.get()) is not None:
+            yield meeting
+        await scraper
+    finally:
+        scraper.cancel()
 
-    print("\nAuthenticating with Google Calendar...")
-    calendar_service, user_email, user_timezone = get_calendar_service()
-    if not calendar_service:
-        print("Failed to authenticate with Google Calendar. Exiting.")
-        return
+async def get_meetings(freq='week', user_config=None):
+    """
+    Fetch meetings from Outlook calendar using Playwright.
 
-    if not meetings_data:
-        print("No meetings to sync.")
-        return
+    Args:
+        freq (str): Frequency of the calendar view ('day', 'week' or 'month'). Default is 'week'.
+        user_config (dict, optional): User configuration with scraping settings.
 
-    # Load user config and ignore list
-    user_config = user_config or load_user_config()
-    ignore_list = user_config.get("ignore_list", [])
-    user_email_to_check = user_config.get("user_email", "").lower()
+    Returns:
+        list: The scraped Meeting records.
+    """
+    return [meeting async for meeting in iter_meetings(freq, user_config)]
 
-    if ignore_list:
-        print(f"\nLoaded {len(ignore_list)} strings from ignore_list. Meetings containing these strings will be ignored.")
+class CalendarSync:
+    """
+    Diffs scraped meetings against Google Calendar and queues the resulting writes.
 
-    # Determine the date range of the scraped meetings
-    dates = [parse_date_string(m["date"]) for m in meetings_data]
-    valid_dates = [d for d in dates if d is not None]
+    prepare() authenticates and loads the existing events. It only blocks on network
+    calls, so it can run in a thread while the browser is still scraping. Each meeting
+    is then handed to sync_meeting(), and finish() sends the remaining writes and
+    records their results in the sync state.
+    """
 
-    if not valid_dates:
-        print("Could not parse any dates from the scraped meetings. Cannot fetch existing events.")
-        return
+    def __init__(self, user_config, account=None):
+        self.user_config = user_config
+        # Google service, email and timezone, kept between syncs in watch mode
+        self.account = account
+        # Compiled once per distinct list, see meeting_filter.py
+        self.ignore_matcher = get_ignore_matcher(user_config.get("ignore_list", []))
+        self.user_email_to_check = user_config.get("user_email", "").lower()
+        # Remembers which Google event each meeting was written to and with what content
+        self.state = SyncState(get_state_path("sync_state.db"))
+        # Google events already matched to a meeting during this run
+        self.claimed_event_ids = set()
+        self.existing_events_by_id = {}
+        self.existing_events_dict = {}
+        self.writer = None
+        self.min_date = self.max_date = None
+        self.scraped = 0
 
-    min_date = min(valid_dates)
-    max_date = max(valid_dates)
+    def prepare(self, min_date, max_date, auto_flush=True):
+        """
+        Authenticates with Google and loads the existing events between two dates.
 
+        Returns:
+            bool: Whether meetings can be synced.
+        """
+        # The Google client libraries are slow to load, they are only imported here
+        from google_calendar import get_calendar_service, configure_executor, iter_events, BatchWriter, EventMirror
+        from googleapiclient.errors import HttpError
 
-    # Fetch existing Google Calendar events for the determined date range
-    time_min = datetime.combine(min_date, time.min).isoformat() + 'Z'  # 'Z' indicates UTC
-    time_max = datetime.combine(max_date, time.max).isoformat() + 'Z'
+        user_config = self.user_config
 
-    print(f"\nFetching existing Google Calendar events from {min_date} to {max_date} to check for duplicates...")
-    existing_events = get_events(calendar_service, time_min, time_max)
-    # Create a dictionary mapping event titles to the full event object for easy lookup
-    existing_events_dict = {event['summary']: event for event in existing_events}
-    print(f"Found {len(existing_events_dict)} existing events.")
+        # Every Google API call is rate limited and retried on quota or server errors
+        configure_executor(
+            rate=float(user_config.get("google_rate_limit", 10)),
+            max_concurrency=int(user_config.get("google_max_concurrency", 4)),
+            max_retries=int(user_config.get("google_max_retries", 5)),
+            base_delay=float(user_config.get("google_retry_delay", 1.0))
+        )
 
-    print(f"\nProcessing {len(meetings_data)} scraped meetings...")
-    for meeting in meetings_data:
-        title = meeting["title"]
+        if self.account is None:
+            print("\nAuthenticating with Google Calendar...")
+            with metrics.span("google.auth"):
+                self.account = get_calendar_service(
+                    account_ttl_hours=float(user_config.get("account_cache_ttl_hours", 24)),
+                    base_url=user_config.get("google_base_url")
+                )
+        calendar_service, self.user_email, self.user_timezone = self.account
+        if not calendar_service:
+            self.account = None
+            print("Failed to authenticate with Google Calendar. Exiting.")
+            return False
+
+        if self.ignore_matcher:
+            print(f"\nLoaded {len(self.ignore_matcher)} rules from ignore_list. Meetings matching them will be ignored.")
 
-        # Check if the meeting title contains any string from the ignore list
-        if any(ignore_str in title for ignore_str in ignore_list):
-            print(f"Event '{title}' contains an ignored keyword. Skipping.")
-            continue
+        # Fetch existing Google Calendar events for the determined date range. They are
+        # kept in a local mirror, so only the changes since the last run are downloaded.
+        print(f"\nFetching existing Google Calendar events from {min_date} to {max_date} to check for duplicates...")
+        # The events are listed lazily, the span covers their indexing
+        with metrics.span("google.list") as span:
+            mirror = EventMirror(get_state_path("google_events.json"))
+            # The mirror starts at the beginning of the month, so that weekly syncs keep reusing it
+            mirror_start = datetime.combine(min_date.replace(day=1), time.min).isoformat() + 'Z'  # 'Z' indicates UTC
+            if mirror.sync(calendar_service, mirror_start, full=user_config.get("full_resync", False)):
+                span["mirror"] = True
+                existing_events = mirror.events_between(min_date, max_date)
+            else:
+                time_min = datetime.combine(min_date, time.min).isoformat() + 'Z'
+                time_max = datetime.combine(max_date, time.max).isoformat() + 'Z'
+                existing_events = iter_events(calendar_service, time_min, time_max)
+
+            # Index the existing events by id (for meetings synced before) and by title and
+            # date (for meetings CalSync doesn't know about yet)
+            try:
+                for event in existing_events:
+                    if 'summary' not in event or 'dateTime' not in event.get('start', {}):
+                        continue
+                    self.existing_events_by_id[event['id']] = event
+                    event_start = datetime.fromisoformat(event['start']['dateTime'].replace('Z', '+00:00'))
+                    self.existing_events_dict.setdefault((event['summary'], event_start.date()), []).append((event_start.time(), event))
+            except HttpError as error:
+                # Syncing against part of the calendar would duplicate the events that are missing
+                span["error"] = type(error).__name__
+                print(f"An error occurred while fetching events: {error}. Cannot check for duplicates, stopping.")
+                return False
+            span["events"] = len(self.existing_events_by_id)
+        print(f"Found {len(self.existing_events_by_id)} existing events.")
+
+        # Writes are queued and sent to Google in batches
+        self.writer = BatchWriter(calendar_service, auto_flush=auto_flush)
+        self.min_date, self.max_date = min_date, max_date
+        return True
+
+    def sync_meeting(self, meeting):
+        """Compares a scraped meeting with Google Calendar and queues the write it needs, if any."""
+        title = meeting.title
+
+        # Check if the meeting title matches a rule of the ignore list
+        rule = self.ignore_matcher.match(title)
+        if rule is not None:
+            print(f"Event '{title}' matches the ignore_list entry {rule}. Skipping.")
+            return
 
         # Check if user's Google email is in the participants list
-        participants = meeting.get("participants", [])
-        if user_email_to_check and any(user_email_to_check == p.lower() for p in participants):
+        if self.user_email_to_check and is_participant(self.user_email_to_check, meeting.participants):
             print(f"Event '{title}' is skipped because you are already a participant.")
-            continue
+            return
 
         # Handle cancelled events
-        cancelled_prefixes = ["Annulé : ", "Cancelled: "]
-        original_title = title
-        is_cancelled = False
-        for prefix in cancelled_prefixes:
-            if title.startswith(prefix):
-                original_title = title.replace(prefix, "").strip()
-                is_cancelled = True
-                break
+        original_title, is_cancelled = split_cancelled(title)
+        is_cancelled = is_cancelled or meeting.cancelled
 
-        if is_cancelled:
-            if original_title in existing_events_dict:
-                event_to_delete = existing_events_dict[original_title]
-                print(f"Event '{original_title}' was cancelled. Deleting from Google Calendar...")
-                delete_event(calendar_service, event_to_delete['id'])
-            else:
-                print(f"Cancelled event '{original_title}' not found in Google Calendar. Skipping.")
-            continue
-
-        start_time_str = meeting["start_time"]
-        end_time_str = meeting["end_time"]
-        date_str = meeting["date"]
-        description = meeting.get("description", "") # Get description, default to empty string
+        description = meeting.description
 
         try:
-            meeting_date = parse_date_string(date_str)
-            if not meeting_date:
-                print(f"Could not parse date string '{date_str}' with known formats. Skipping event '{title}'.")
-                continue
-
-            try:
-                # First, try parsing with 24-hour format
-                start_time_obj = datetime.strptime(start_time_str, "%H:%M").time()
-                end_time_obj = datetime.strptime(end_time_str, "%H:%M").time()
-            except ValueError:
-                # If that fails, fall back to 12-hour AM/PM format
-                start_time_obj = datetime.strptime(start_time_str, "%I:%M %p").time()
-                end_time_obj = datetime.strptime(end_time_str, "%I:%M %p").time()
+            meeting.parse()
         except ValueError as e:
             print(f"Could not parse date or time for event '{title}': {e}. Skipping.")
-            continue
+            return
+        meeting_date, start_time_obj, end_time_obj = meeting.meeting_date, meeting.start, meeting.end
+
+        # Existing events were only loaded for this range, a meeting outside of it could end up duplicated
+        if not self.min_date <= meeting_date <= self.max_date:
+            print(f"Event '{title}' on {meeting_date} is outside of the synced range. Skipping.")
+            return
+
+        fingerprint = meeting_fingerprint(original_title, meeting_date, start_time_obj)
+        synced = self.state.get(fingerprint)
+        existing_event = None
+        if synced and synced["event_id"] in self.existing_events_by_id:
+            existing_event = self.existing_events_by_id[synced["event_id"]]
+        else:
+            # Same title on the same day, preferring the occurrence starting at the same time
+            candidates = [
+                (event_start != start_time_obj, event)
+                for event_start, event in self.existing_events_dict.get((original_title, meeting_date), [])
+                if event['id'] not in self.claimed_event_ids
+            ]
+            if candidates:
+                existing_event = min(candidates, key=lambda candidate: candidate[0])[1]
+        if existing_event:
+            self.claimed_event_ids.add(existing_event['id'])
+
+        if is_cancelled:
+            # Without its participants, a cancelled meeting may be one the user was invited
+            # to on Google directly: only delete events CalSync wrote
+            if existing_event and meeting.cancelled and not (
+                    (synced and synced["event_id"] == existing_event['id']) or stored_hash(existing_event)):
+                print(f"Cancelled event '{original_title}' wasn't created by CalSync. Skipping.")
+            elif existing_event:
+                print(f"Event '{original_title}' was cancelled. Deleting from Google Calendar...")
+                self.writer.delete_event(existing_event['id'], summary=original_title, tag=(meeting, fingerprint, None))
+            else:
+                print(f"Cancelled event '{original_title}' not found in Google Calendar. Skipping.")
+            return
 
         # Check if the meeting is in the past and skip if it is
         meeting_start_datetime = datetime.combine(meeting_date, start_time_obj)
         if meeting_start_datetime < datetime.now():
             print(f"Event '{title}' is in the past. Skipping.")
-            continue
+            return
 
-        if title in existing_events_dict:
-            existing_event = existing_events_dict[title]
+        canonical = canonical_meeting(title, meeting_date, start_time_obj, end_time_obj, description)
+        meeting_hash = content_hash(canonical)
+        private_properties = {HASH_PROPERTY: meeting_hash}
 
-            # Parse existing event's start and end times
-            existing_start_dt = datetime.fromisoformat(existing_event['start'].get('dateTime').replace('Z', '+00:00'))
-            existing_end_dt = datetime.fromisoformat(existing_event['end'].get('dateTime').replace('Z', '+00:00'))
-
-            # Combine scraped date and time
-            scraped_start_dt = datetime.combine(meeting_date, start_time_obj)
-            scraped_end_dt = datetime.combine(meeting_date, end_time_obj)
-
-            # Compare dates and times (ignoring timezone for a direct comparison)
-            if (existing_start_dt.date() != scraped_start_dt.date() or
-                existing_start_dt.time() != scraped_start_dt.time() or
-                existing_end_dt.time() != scraped_end_dt.time() or
-                existing_event.get('description', '') != description):
+        if existing_event:
+            # Written by CalSync with this exact content and untouched since: nothing to compare
+            if synced and synced["event_id"] == existing_event['id'] and synced["content_hash"] == meeting_hash \
+                    and synced["etag"] == existing_event.get('etag'):
+                print(f"Event '{title}' already exists and is up to date. Skipping.")
+                return
 
-                print(f"Event '{title}' has changed. Updating in Google Calendar...")
-                update_event(
-                    calendar_service,
+            # Compare the canonical forms, so formatting changes made by Google don't count
+            changed = [] if stored_hash(existing_event) == meeting_hash else changed_fields(canonical_google_event(existing_event), canonical)
+            if changed:
+                print(f"Event '{title}' has changed ({', '.join(changed)}). Updating in Google Calendar...")
+                self.writer.patch_event(
                     existing_event['id'],
+                    changed,
                     title,
                     start_time_obj,
                     end_time_obj,
                     meeting_date,
-                    user_email,
-                    user_timezone,
-                    description
+                    self.user_email,
+                    self.user_timezone,
+                    description,
+                    private_properties=private_properties,
+                    # Only notify about changes of schedule
+                    send_updates='all' if {'start', 'end'} & set(changed) else 'none',
+                    tag=(meeting, fingerprint, meeting_hash)
                 )
             else:
                 print(f"Event '{title}' already exists and is up to date. Skipping.")
-            continue
+                self.state.record(fingerprint, existing_event['id'], meeting_hash, existing_event.get('etag'))
+            return
 
         # If the event is not cancelled and does not exist, create it.
         print(f"Creating Google Calendar event for '{title}' on {meeting_date}...")
-        create_event(calendar_service, title, start_time_obj, end_time_obj, meeting_date, user_email, user_timezone, description)
+        self.writer.create_event(title, start_time_obj, end_time_obj, meeting_date, self.user_email, self.user_timezone, description,
+                                 private_properties=private_properties, tag=(meeting, fingerprint, meeting_hash))
+
+    def finish(self):
+        """Sends whatever is still queued and records the results in the sync state."""
+        if self.writer:
+            self.writer.flush()
+            failed = []
+            for action, (meeting, fingerprint, meeting_hash), response, error in self.writer.results:
+                if error is not None:
+                    failed.append(meeting)
+                elif action == 'delete':
+                    self.state.forget(fingerprint)
+                else:
+                    self.state.record(fingerprint, response['id'], meeting_hash, response.get('etag'))
+
+            print(f"\nSent {len(self.writer.results)} changes to Google Calendar, {len(failed)} failed.")
+            for meeting in failed:
+                print(f"  - '{meeting.title}' on {meeting.date} was not synced.")
+        if self.ignore_matcher:
+            print(self.ignore_matcher.summary())
+        self.state.close()
+
+    async def consume(self, meetings, ready, workers=4):
+        """
+        Syncs the meetings yielded by an async iterator (see iter_meetings).
+
+        Writes are sent by a pool of worker threads as soon as a batch is full, or
+        whenever the next meeting isn't scraped yet, so they overlap with the scraping.
+
+        Args:
+            meetings: Async iterator of Meeting records.
+            ready (asyncio.Future): Resolves to the result of prepare().
+            workers (int): Number of threads sending writes to Google.
+        """
+        loop = asyncio.get_running_loop()
+        meetings = meetings.__aiter__()
+        # Start scraping right away, without waiting for Google to be ready
+        next_meeting = asyncio.ensure_future(meetings.__anext__())
+        sends = []
+        try:
+            prepared = await ready
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                while True:
+                    try:
+                        meeting = await next_meeting
+                    except StopAsyncIteration:
+                        break
+                    next_meeting = asyncio.ensure_future(meetings.__anext__())
+                    self.scraped += 1
+                    if not prepared:
+                        continue
+                    self.sync_meeting(meeting)
+                    # Let the scraper hand over a meeting that is already waiting
+                    await asyncio.sleep(0)
+                    if self.writer.pending and (self.writer.pending >= self.writer.batch_size or not next_meeting.done()):
+                        sends.append(loop.run_in_executor(pool, self.writer.send, self.writer.take_chunk()))
+                await asyncio.gather(*sends)
+        finally:
+            # Even if the scraping failed, the meetings collected so far are synced
+            next_meeting.cancel()
+            self.finish()
+
+def update_meetings(meetings_data, user_config=None):
+    """
+    Updates the Google Calendar with the provided meeting data.
+
+    Args:
+        meetings_data (list): A list of Meeting records from get_meetings.
+    """
+
+    # Load user config
+    user_config = user_config or load_user_config()
+
+    if not meetings_data:
+        print("No meetings to sync.")
+        return
+
+    # Determine the date range of the scraped meetings
+    valid_dates = []
+    for meeting in meetings_data:
+        try:
+            valid_dates.append(meeting.parse().meeting_date)
+        except ValueError:
+            pass
+
+    if not valid_dates:
+        print("Could not parse any dates from the scraped meetings. Cannot fetch existing events.")
+        return
+
+    syncer = CalendarSync(user_config)
+    if not syncer.prepare(min(valid_dates), max(valid_dates)):
+        syncer.finish()
+        return
+
+    print(f"\nProcessing {len(meetings_data)} scraped meetings...")
+    for meeting in meetings_data:
+        syncer.sync_meeting(meeting)
+    syncer.finish()
 
 async def main():
     """Main function to run the calendar sync process."""
@@ -354,17 +929,176 @@ async def main():
     parser.add_argument('frequency', type=str, nargs='?', default='week', choices=['day', 'week', 'month'],
                         help="The calendar view to sync: 'day', 'week', or 'month'. Defaults to 'week'.")
     parser.add_argument('--email', type=str, help="Your client email address. Use this to run in non-interactive mode.")
+    parser.add_argument('--capture', type=str, choices=['network', 'dom'],
+                        help="How to read event details: from the calendar's network responses ('network', default) or by opening each event ('dom').")
+    parser.add_argument('--pages', type=int,
+                        help="Number of browser pages scraping the week (day by day) or month (week by week) concurrently.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Open every event again instead of reusing the details scraped on previous runs.")
+    parser.add_argument('--full-resync', action='store_true',
+                        help="Download every Google Calendar event again instead of only the changes since the last run.")
+    parser.add_argument('--record-fixture', type=str, metavar='PATH',
+                        help="Save the scraped meetings to a fixture file, to benchmark the scraper offline with benchmark.py.")
+    parser.add_argument('--headed', action='store_true',
+                        help="Always show the browser window, even if the Outlook session is still logged in.")
+    parser.add_argument('--watch', type=float, nargs='?', const=0, metavar='MINUTES',
+                        help="Keep running and sync again every MINUTES (15 by default), reusing the same browser window.")
+    parser.add_argument('--import-profile', action='store_true',
+                        help="Report how long each module took to import once the sync is done.")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the whole run and save a pstats file and flame graph stacks in the profiles folder.")
     args = parser.parse_args()
 
+    # Heavy dependencies are imported by the stage that needs them, so they are all timed
+    profiler = ImportProfiler() if args.import_profile else None
+    run_profiler = RunProfiler(get_state_path("profiles")) if args.profile else None
+    if profiler:
+        profiler.start()
+    if run_profiler:
+        run_profiler.start()
+    try:
+        await run(args)
+    finally:
+        if run_profiler:
+            run_profiler.stop()
+            run_profiler.report()
+        if profiler:
+            profiler.stop()
+            profiler.report()
+
+async def run(args):
+    """Runs the sync with the parsed command line arguments."""
     print("Loading user configuration...")
-    user_config = load_user_config(email=args.email)
+    with metrics.span("config.load"):
+        user_config = load_user_config(email=args.email)
+    if args.capture:
+        user_config["capture_mode"] = args.capture
+    if args.pages:
+        user_config["max_pages"] = args.pages
+    if args.no_cache:
+        user_config["cache_ttl_hours"] = 0
+    if args.full_resync:
+        user_config["full_resync"] = True
+    if args.headed:
+        user_config["headless"] = False
+    if args.record_fixture:
+        user_config["record_fixture"] = args.record_fixture
+    # Compiled up front, so invalid rules are reported before the browser opens
+    get_ignore_matcher(user_config.get("ignore_list", []))
+
+    # Two runs would share the browser profile and the sync state
+    lock = RunLock(get_state_path("calsync.lock"))
+    if not lock.acquire():
+        owner = lock.owner()
+        print(f"CalSync is already running{f' (process {owner})' if owner else ''}. Exiting.")
+        return
+    try:
+        if args.watch is not None:
+            interval = args.watch or float(user_config.get("watch_interval_minutes", 15))
+            await watch(args.frequency, user_config, interval)
+        else:
+            await sync_once(args.frequency, user_config)
+    finally:
+        lock.release()
 
-    meetings = await get_meetings(args.frequency)
-    # print(json.dumps(meetings, indent=4, ensure_ascii=False))
-    if meetings:
-        update_meetings(meetings, user_config=user_config)
-    else:
+def report_metrics(user_config):
+    """
+    Prints the timings and counters recorded since the last report, appends them to
+    'metrics_file' (metrics.jsonl by default, empty to disable) and writes them to
+    'prometheus_textfile' if set. Then starts recording the next sync.
+    """
+    print("\n" + metrics.summary())
+    try:
+        metrics_file = user_config.get("metrics_file", get_state_path("metrics.jsonl"))
+        if metrics_file:
+            metrics.write_jsonl(metrics_file)
+        if user_config.get("prometheus_textfile"):
+            metrics.write_prometheus(user_config["prometheus_textfile"])
+    except OSError as e:
+        print(f"Could not write the metrics: {e}")
+    metrics.reset()
+
+async def sync_once(freq, user_config, context=None, account=None):
+    """
+    Scrapes the calendar and syncs the meetings to Google Calendar.
+
+    Args:
+        freq (str): Frequency of the calendar view ('day', 'week' or 'month').
+        user_config (dict): User configuration with scraping and sync settings.
+        context (BrowserContext, optional): Browser to scrape with, left open.
+        account (tuple, optional): Google service, email and timezone from a previous sync.
+
+    Returns:
+        CalendarSync: The finished sync, holding the Google account to reuse.
+    """
+    # Meetings are synced as they are scraped: Google authentication and the existing
+    # events are loaded in a thread while the browser opens, and writes are sent by
+    # worker threads while the scraping goes on.
+    # The ignore matcher is shared by every sync of a watch session, its hits are counted per sync
+    get_ignore_matcher(user_config.get("ignore_list", [])).reset()
+    syncer = CalendarSync(user_config, account)
+    ready = asyncio.ensure_future(asyncio.to_thread(syncer.prepare, *get_sync_window(freq), auto_flush=False))
+    try:
+        with metrics.span("sync.total"):
+            await syncer.consume(iter_meetings(freq, user_config, context), ready, workers=int(user_config.get("google_writers", 4)))
+    finally:
+        report_metrics(user_config)
+    if not syncer.scraped:
         print("No meetings found to sync.")
+    return syncer
+
+async def watch(freq, user_config, interval_minutes):
+    """
+    Syncs every interval_minutes until the browser window is closed, or Ctrl+C is
+    pressed when there is no window.
+
+    The browser and the Google service are kept between syncs, so each one only
+    scrapes the calendar again and pushes the changes. The interval is jittered by
+    'watch_jitter' (10% by default) so syncs don't always hit Outlook and Google at
+    the same time.
+
+    Args:
+        freq (str): Frequency of the calendar view ('day', 'week' or 'month').
+        user_config (dict): User configuration with scraping and sync settings.
+        interval_minutes (float): Time between the end of a sync and the start of the next one.
+    """
+    from playwright.async_api import async_playwright
+
+    jitter = min(max(float(user_config.get("watch_jitter", 0.1)), 0), 1)
+    account = None
+
+    def watch_close(context):
+        closed = asyncio.Event()
+        context.on("close", lambda _: closed.set())
+        return closed
+
+    async with async_playwright() as p:
+        context, headless = await launch_browser(p, user_config.get("headless", "auto"))
+        closed = watch_close(context)
+
+        while not closed.is_set():
+            syncer = await sync_once(freq, user_config, context, account)
+            account = syncer.account
+            if closed.is_set():
+                break
+
+            delay = interval_minutes * 60 * random.uniform(1 - jitter, 1 + jitter)
+            next_sync = datetime.now() + timedelta(seconds=delay)
+            stop_hint = "Press Ctrl+C to stop." if headless else "Close the browser window to stop."
+            print(f"\nNext sync at {next_sync.strftime('%H:%M:%S')}. {stop_hint}")
+            try:
+                await asyncio.wait_for(closed.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+            # The session may have expired since the last sync, the user then has to log in
+            if headless and not closed.is_set() and not await session_is_authenticated(context):
+                await context.close()
+                print("Outlook login required, opening a browser window...")
+                context, headless = await launch_browser(p, False)
+                closed = watch_close(context)
+
+        print("\nWindow closed, leaving watch mode.")
 
 if __name__ == "__main__":
     print("""
@@ -0,0 +1,67 @@
+"""
+Timeouts that adapt to the latency observed so far, so waits on a fast calendar
+fail fast and waits on a slow one don't fail spuriously.
+"""
+import time
+from collections import deque
+
+
+def percentile(samples, fraction):
+    """Returns the given percentile (0 to 1) of a list of samples, by nearest rank."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class AdaptiveTimeout:
+    """
+    A timeout in milliseconds derived from the recent latencies of a wait: factor
+    times their 95th percentile, kept between floor and ceiling.
+
+    Until min_samples latencies are known, the initial timeout is used.
+    """
+
+    def __init__(self, initial, floor=250, ceiling=None, factor=2.0, window=50, min_samples=5):
+        self.initial = initial
+        self.floor = floor
+        self.ceiling = ceiling if ceiling is not None else initial * 2
+        self.factor = factor
+        self.min_samples = min_samples
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency):
+        self.samples.append(latency)
+
+    def timeout(self):
+        if len(self.samples) < self.min_samples:
+            return self.initial
+        return int(max(self.floor, min(self.ceiling, percentile(self.samples, 0.95) * self.factor)))
+
+    async def wait(self, wait_for):
+        """
+        Awaits wait_for(timeout) with the current timeout and records how long it took.
+
+        A wait that expires under a timeout shortened below the initial one is given
+        the rest of the initial timeout, so a single slow event on a fast calendar
+        isn't given up on. A wait that fails counts as taking the whole time waited,
+        so repeated timeouts raise it.
+        """
+        timeout = self.timeout()
+        start = time.perf_counter()
+        try:
+            result = await wait_for(timeout)
+        except Exception:
+            if timeout >= self.initial:
+                self.record(timeout)
+                raise
+            try:
+                result = await wait_for(self.initial - timeout)
+            except Exception:
+                self.record(self.initial)
+                raise
+        self.record((time.perf_counter() - start) * 1000)
+        return result
+
+    def summary(self):
+        if not self.samples:
+            return "no samples"
+        return f"p50 {percentile(self.samples, 0.5):.0f} ms, p95 {percentile(self.samples, 0.95):.0f} ms"
@@ -0,0 +1,91 @@
+"""
+Parsing of the dates and times shown in Outlook's calendar, in English
+('Monday, July 21, 2025', '2:30 PM') or French ('lundi 21 juillet 2025', '14:30'),
+as well as the ISO format of the captured network responses.
+
+The known formats are matched with precompiled patterns and month tables, and
+results are memoised since the same dates come up for every meeting of a day.
+dateparser is only used as a fallback for anything else.
+"""
+import re
+from datetime import date, time
+from functools import lru_cache
+
+# Languages Outlook's calendar is expected in, pinned so dateparser doesn't have to detect them
+LANGUAGES = ['en', 'fr']
+
+MONTHS = {
+    # English
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8,
+    'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+    # French, with and without accents
+    'janvier': 1, 'février': 2, 'fevrier': 2, 'mars': 3, 'avril': 4, 'mai': 5, 'juin': 6,
+    'juillet': 7, 'août': 8, 'aout': 8, 'septembre': 9, 'octobre': 10, 'novembre': 11,
+    'décembre': 12, 'decembre': 12,
+    'janv': 1, 'févr': 2, 'fevr': 2, 'avr': 4, 'juil': 7, 'déc': 12,
+}
+
+# 'Monday, July 21, 2025'
+ENGLISH_DATE = re.compile(r"(?:\w+,\s+)?(\w+)\.?\s+(\d{1,2}),\s+(\d{4})")
+# 'lundi 21 juillet 2025'
+FRENCH_DATE = re.compile(r"(?:\w+\s+)?(\d{1,2})(?:er)?\s+(\w+)\.?\s+(\d{4})")
+# '2025-07-21'
+ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+# '14:30' or '2:30 PM'
+TIME = re.compile(r"(\d{1,2}):(\d{2})(?:\s*([AP])\.?M\.?)?", re.IGNORECASE)
+
+
+def _build_date(year, month, day):
+    try:
+        return date(int(year), month, int(day))
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=1024)
+def parse_date_string(date_str):
+    """
+    Parses a date string in one of Outlook's English or French formats.
+    Returns a date, or None if it can't be parsed.
+    """
+    date_str = date_str.strip()
+
+    match = ISO_DATE.fullmatch(date_str)
+    if match:
+        return _build_date(match[1], int(match[2]), match[3])
+
+    match = ENGLISH_DATE.fullmatch(date_str)
+    if match and match[1].lower() in MONTHS:
+        return _build_date(match[3], MONTHS[match[1].lower()], match[2])
+
+    match = FRENCH_DATE.fullmatch(date_str)
+    if match and match[2].lower() in MONTHS:
+        return _build_date(match[3], MONTHS[match[2].lower()], match[1])
+
+    # Unknown format, let dateparser figure it out. It loads a lot of locale data,
+    # so it is only imported when needed.
+    import dateparser
+    parsed_date = dateparser.parse(date_str, languages=LANGUAGES)
+    if parsed_date:
+        return parsed_date.date()
+    return None
+
+
+@lru_cache(maxsize=1024)
+def parse_time_string(time_str):
+    """
+    Parses a time string in 24-hour ('14:30') or 12-hour ('2:30 PM') format.
+    Raises ValueError if neither format matches.
+    """
+    match = TIME.fullmatch(time_str.strip())
+    if not match:
+        raise ValueError(f"time data '{time_str}' does not match a known format")
+
+    hour, minute = int(match[1]), int(match[2])
+    if match[3]:
+        if not 1 <= hour <= 12:
+            raise ValueError(f"time data '{time_str}' has an invalid hour")
+        hour = hour % 12 + (12 if match[3].upper() == 'P' else 0)
+    return time(hour, minute)
@@ -0,0 +1,205 @@
+"""
+Calendar fixtures for running the scraper without Outlook: recording the meetings
+of a real session, generating synthetic ones, and replaying them in a browser
+context as a local page with the structure the scraper expects (event buttons in
+'resizeBoxParent' boxes, 'UniqueMessageBody_' descriptions, 'fui-Persona__primaryText'
+participants) along with an OWA-like JSON response for the network capture.
+"""
+import json
+import os
+import random
+from datetime import date, datetime, timedelta
+
+from date_parsing import parse_date_string, parse_time_string
+
+FIXTURE_FIELDS = ("title", "date", "start_time", "end_time", "description", "participants")
+
+REPLAY_PAGE = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Calendar</title></head>
+<body>
+<div role="main" id="calendar"></div>
+<script>
+const EVENTS = __EVENTS__;
+const LATENCY = __LATENCY__;
+const later = (fn) => setTimeout(fn, LATENCY * (0.5 + Math.random()));
+
+function closeModal() {
+    const modal = document.getElementById("modal");
+    if (modal) modal.remove();
+}
+
+function closeButton(modal) {
+    const close = document.createElement("button");
+    close.setAttribute("aria-label", "Close");
+    close.onclick = closeModal;
+    modal.appendChild(close);
+}
+
+function openPreview(i) {
+    closeModal();
+    later(() => {
+        const modal = document.createElement("div");
+        modal.id = "modal";
+        const view = document.createElement("button");
+        view.setAttribute("aria-label", "View event");
+        view.onclick = () => openDetails(i);
+        modal.appendChild(view);
+        closeButton(modal);
+        document.body.appendChild(modal);
+    });
+}
+
+function openDetails(i) {
+    later(() => {
+        const modal = document.getElementById("modal");
+        modal.innerHTML = "";
+        const body = document.createElement("div");
+        body.id = "UniqueMessageBody_" + i;
+        body.innerHTML = EVENTS[i].description;
+        modal.appendChild(body);
+        closeButton(modal);
+        // Participants show up after the body, like in Outlook
+        later(() => EVENTS[i].participants.forEach((participant) => {
+            const persona = document.createElement("span");
+            persona.className = "fui-Persona__primaryText";
+            persona.textContent = participant;
+            modal.appendChild(persona);
+        }));
+    });
+}
+
+later(() => {
+    const calendar = document.getElementById("calendar");
+    EVENTS.forEach((event, i) => {
+        const box = document.createElement("div");
+        box.className = "calendar-SelectionStyles-resizeBoxParent";
+        const button = document.createElement("div");
+        button.setAttribute("role", "button");
+        button.setAttribute("aria-label", event.aria_label);
+        button.textContent = event.title;
+        button.onclick = () => openPreview(i);
+        box.appendChild(button);
+        calendar.appendChild(box);
+    });
+});
+fetch("/owa/service.svc?action=GetCalendarView", {method: "POST"});
+</script>
+</body>
+</html>
+"""
+
+
+def display_date(date_str):
+    """Returns a date as Outlook displays it in English ('Monday, July 21, 2025')."""
+    parsed = parse_date_string(date_str)
+    if parsed is None:
+        return date_str
+    return f"{parsed:%A}, {parsed:%B} {parsed.day}, {parsed.year}"
+
+
+def save_fixture(path, meetings):
+    """Writes meetings (Meeting records) to a fixture file."""
+    events = []
+    for meeting in meetings:
+        event = {field: getattr(meeting, field) for field in FIXTURE_FIELDS}
+        # Meetings read from network responses have ISO dates, the calendar shows them in full
+        event["date"] = display_date(event["date"])
+        events.append(event)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"recorded_at": datetime.now().isoformat(), "events": events}, f, indent=2, ensure_ascii=False)
+
+
+def load_fixture(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+class FixtureRecorder:
+    """Collects the meetings of a scraping session, to be saved as a fixture."""
+
+    def __init__(self, path):
+        self.path = path
+        self.meetings = []
+
+    def add(self, meeting):
+        self.meetings.append(meeting)
+
+    def save(self):
+        save_fixture(self.path, self.meetings)
+        print(f"Recorded {len(self.meetings)} meetings to {self.path}.")
+
+
+def synthetic_fixture(count, start=None, seed=0):
+    """
+    Generates a fixture of count meetings spread over the week of start (today by
+    default), with HTML descriptions and zero to five participants each.
+    """
+    rng = random.Random(seed)
+    start = start or date.today()
+    monday = start - timedelta(days=start.weekday())
+    events = []
+    for i in range(count):
+        day = monday + timedelta(days=i % 5)
+        begin = datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=15 * (i // 5 % 40))
+        end = begin + timedelta(minutes=rng.choice((15, 30, 60)))
+        paragraphs = "".join(f"<p>Agenda item {n + 1} for meeting {i}.</p>" for n in range(rng.randint(1, 4)))
+        events.append({
+            "title": f"Synthetic meeting {i}",
+            "date": f"{day:%A}, {day:%B} {day.day}, {day.year}",
+            "start_time": begin.strftime("%H:%M"),
+            "end_time": end.strftime("%H:%M"),
+            "description": f"<div>{paragraphs}</div>",
+            "participants": [f"person{n}@example.com" for n in range(rng.randint(0, 5))],
+        })
+    return {"recorded_at": None, "events": events}
+
+
+def _owa_items(fixture):
+    """Returns the fixture's events in the shape of an OWA GetCalendarView response."""
+    items = []
+    for i, event in enumerate(fixture["events"]):
+        try:
+            day = parse_date_string(event["date"])
+            start = datetime.combine(day, parse_time_string(event["start_time"]))
+            end = datetime.combine(day, parse_time_string(event["end_time"]))
+        except (TypeError, ValueError):
+            continue
+        items.append({
+            "ItemId": {"Id": f"fixture-{i}"},
+            "Subject": event["title"],
+            "Start": start.isoformat(),
+            "End": end.isoformat(),
+            "Body": {"Value": event["description"]},
+            "RequiredAttendees": [{"Mailbox": {"EmailAddress": participant}} for participant in event["participants"]],
+        })
+    return {"Body": {"Items": items}}
+
+
+async def install_replay(context, fixture, latency_ms=20, network=True):
+    """
+    Serves a fixture in place of Outlook for every page of a browser context.
+
+    Args:
+        context (BrowserContext): The browser context to route.
+        fixture (dict): A fixture from load_fixture or synthetic_fixture.
+        latency_ms (int): Average delay of the page's reactions (rendering, opening an event).
+        network (bool): Whether to answer the calendar's data request, for the network capture.
+    """
+    events = [dict(event, aria_label=f"{event['title']}, {event['start_time']} to {event['end_time']}, {event['date']}")
+              for event in fixture["events"]]
+    page = (REPLAY_PAGE
+            .replace("__EVENTS__", json.dumps(events, ensure_ascii=False))
+            .replace("__LATENCY__", str(int(latency_ms))))
+    data = json.dumps(_owa_items(fixture) if network else {}, ensure_ascii=False)
+
+    async def handle(route):
+        if "/owa/service.svc" in route.request.url:
+            await route.fulfill(status=200, content_type="application/json", body=data)
+        else:
+            await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=page)
+
+    await context.route("https://outlook.office.com/**", handle)
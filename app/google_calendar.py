@@ -1,15 +1,43 @@
 import datetime
+import json
 import os.path
+import threading
+import time
 
+import httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from metrics import metrics
+from request_executor import RequestExecutor, is_retryable, is_rate_limited
 
 # If modifying these scopes, delete the file token.json.
 SCOPES = ["https://www.googleapis.com/auth/calendar.events", "https://www.googleapis.com/auth/userinfo.email", "openid", "https://www.googleapis.com/auth/calendar.readonly"]
 
+# Maximum number of calls the Calendar API accepts in a single batch request
+BATCH_SIZE = 50
+
+# Every request to Google goes through this executor, see configure_executor
+_executor = RequestExecutor()
+
+# Where the API is reached instead of Google, if set (see get_calendar_service)
+_base_url = None
+
+# Largest page size events().list accepts
+MAX_LIST_RESULTS = 2500
+
+# Partial response for events().list, limited to what the sync compares
+EVENT_LIST_FIELDS = "nextPageToken,items(id,etag,summary,start,end,description,extendedProperties)"
+
+# Same for incremental syncs, which also need the sync token and deleted events
+EVENT_SYNC_FIELDS = "nextPageToken,nextSyncToken,items(id,etag,status,summary,start,end,description,extendedProperties)"
+
 
 def get_config_dir():
     """Returns the path to the application's configuration directory."""
@@ -23,11 +51,71 @@ def get_config_dir():
     return app_support_dir
 
 
-def get_calendar_service():
+def configure_executor(rate=10.0, max_concurrency=4, max_retries=5, base_delay=1.0):
+    """
+    Replaces the executor shared by every Google API call.
+
+    Args:
+        rate (float): Sustained number of API calls per second.
+        max_concurrency (int): Maximum number of requests in flight at once.
+        max_retries (int): How many times quota and server errors are retried.
+        base_delay (float): Delay before the first retry, in seconds, doubled on each retry.
+    """
+    global _executor
+    _executor = RequestExecutor(rate=rate, burst=max(1, int(rate)), max_concurrency=max_concurrency,
+                                max_retries=max_retries, base_delay=base_delay)
+    return _executor
+
+
+def _client_options(path):
+    """Points a service at the configured base URL, if any."""
+    return {"api_endpoint": f"{_base_url}/{path}"} if _base_url else None
+
+
+def new_batch_request(service, callback):
+    """Returns a batch request for a service, sent to the configured base URL if any."""
+    if _base_url:
+        # googleapiclient takes the batch URL from the discovery document, ignoring the API endpoint
+        return BatchHttpRequest(callback=callback, batch_uri=f"{_base_url}/batch/calendar/v3")
+    return service.new_batch_http_request(callback=callback)
+
+
+def _load_account(path, ttl_hours):
+    """Returns the cached email and timezone of the Google account, or None if missing or expired."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        try:
+            account = json.load(f)
+        except json.JSONDecodeError:
+            return None
+    age = datetime.datetime.now().timestamp() - account.get("cached_at", 0)
+    if age >= ttl_hours * 3600 or not account.get("email") or not account.get("timezone"):
+        return None
+    return account
+
+def _save_account(path, email, timezone):
+    with open(path, "w") as f:
+        json.dump({"email": email, "timezone": timezone, "cached_at": datetime.datetime.now().timestamp()}, f)
+
+def get_calendar_service(account_ttl_hours=24, base_url=None):
     """Gets an authenticated Google Calendar service.
     Returns the calendar service, user email, and timezone.
+
+    The email and timezone are cached for account_ttl_hours, so they aren't
+    requested from Google on every run.
+
+    With base_url, the API is reached there instead of Google, without credentials
+    and without caching the account. It's meant for a local stand-in such as the
+    one in fake_google.py.
     """
+    global _base_url
+    _base_url = base_url.rstrip("/") if base_url else None
+    if _base_url:
+        return _connect(AnonymousCredentials())
+
     creds = None
+    logged_in = False
     # The file token.json stores the user's access and refresh tokens, and is
     # created automatically when the authorization flow completes for the first
     # time.
@@ -48,90 +136,196 @@ def get_calendar_service():
                 credentials_path, SCOPES
             )
             creds = flow.run_local_server(port=0)
+            logged_in = True
         # Save the credentials for the next run
         token_path = get_config_dir() / "token.json"
         with open(token_path, "w") as token:
             token.write(creds.to_json())
 
+    account_path = get_config_dir() / "account.json"
+    return _connect(creds, account_path, account_ttl_hours, use_cached_account=not logged_in)
+
+def _connect(creds, account_path=None, account_ttl_hours=0, use_cached_account=True):
+    """
+    Builds the Calendar service and gets the user's email and timezone, from the
+    account cache at account_path when it is set and fresh.
+    """
     try:
-        service = build("calendar", "v3", credentials=creds)
+        # Both services share a single keep-alive connection, and are built from the
+        # discovery documents bundled with googleapiclient instead of downloading them
+        http = AuthorizedHttp(creds, http=httplib2.Http())
+        service = build("calendar", "v3", http=http, static_discovery=True, client_options=_client_options("calendar/v3/"))
+
+        # Get user's email and timezone, unless they are cached. A new login may be
+        # for another account, so the cache is ignored then.
+        account = _load_account(account_path, account_ttl_hours) if account_path and use_cached_account else None
+        if account:
+            return service, account["email"], account["timezone"]
 
-        # Get user's email and timezone
-        user_info_service = build('oauth2', 'v2', credentials=creds)
-        user_info = user_info_service.userinfo().get().execute()
+        user_info_service = build('oauth2', 'v2', http=http, static_discovery=True, client_options=_client_options(""))
+        user_info = _executor.execute(user_info_service.userinfo().get())
         user_email = user_info.get('email')
 
-        calendar_info = service.calendars().get(calendarId='primary').execute()
+        calendar_info = _executor.execute(service.calendars().get(calendarId='primary'))
         user_timezone = calendar_info.get('timeZone')
 
         if not user_email or not user_timezone:
             print("Could not retrieve user email or timezone. Exiting.")
             return None, None, None
 
+        if account_path:
+            _save_account(account_path, user_email, user_timezone)
         return service, user_email, user_timezone
     except HttpError as error:
         print(f"An error occurred: {error}")
         return None, None, None
 
-def get_events(service, time_min, time_max):
-    """Fetch events from Google Calendar within a given time range."""
-    try:
-        events_result = service.events().list(
+def iter_events(service, time_min, time_max):
+    """
+    Yields the events from Google Calendar within a given time range, following
+    every result page. Only the fields used to compare events are requested.
+
+    An HttpError on any page is raised, so a partial listing is never taken for
+    the whole calendar.
+    """
+    page_token = None
+    while True:
+        events_result = _executor.execute(service.events().list(
             calendarId='primary',
             timeMin=time_min,
             timeMax=time_max,
             singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        return events_result.get('items', [])
-    except HttpError as error:
-        print(f"An error occurred while fetching events: {error}")
-        return []
+            orderBy='startTime',
+            maxResults=MAX_LIST_RESULTS,
+            fields=EVENT_LIST_FIELDS,
+            pageToken=page_token
+        ))
+        yield from events_result.get('items', [])
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return
 
-def update_event(service, event_id, summary, start_time_obj, end_time_obj, date, user_email, time_zone, description):
-    """Updates an existing event in the Google Calendar."""
+def new_authorized_http(service):
+    """
+    Returns a new HTTP connection carrying the same credentials as a service, for
+    requests made from another thread (httplib2 connections aren't thread-safe).
+    """
+    return AuthorizedHttp(service._http.credentials, http=httplib2.Http())
 
-    start_datetime = datetime.datetime.combine(date, start_time_obj)
-    end_datetime = datetime.datetime.combine(date, end_time_obj)
+class EventMirror:
+    """
+    Local copy of the primary calendar's events, kept up to date with the
+    nextSyncToken returned by events().list so that later runs only fetch what
+    changed since the previous one.
 
-    event_body = {
-        'summary': summary,
-        'start': {
-            'dateTime': start_datetime.isoformat(),
-            'timeZone': time_zone,
-        },
-        'end': {
-            'dateTime': end_datetime.isoformat(),
-            'timeZone': time_zone,
-        },
-        'attendees': [
-            {'email': user_email},
-        ],
-        'description': description,
-    }
-    try:
-        updated_event = service.events().update(
-            calendarId='primary',
-            eventId=event_id,
-            body=event_body,
-            sendUpdates='all'
-        ).execute()
-        print(f"Event updated: {updated_event.get('htmlLink')}")
-    except HttpError as error:
-        print(f"An error occurred while updating event '{summary}': {error}")
+    The mirror covers every event starting after time_min. It is rebuilt from
+    scratch when a sync needs older events or when Google expires the token
+    (410 Gone).
+    """
 
+    def __init__(self, path):
+        self.path = path
+        self.sync_token = None
+        self.time_min = None
+        self.events = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                try:
+                    data = json.load(f)
+                    self.sync_token = data.get("sync_token")
+                    self.time_min = data.get("time_min")
+                    self.events = data.get("events", {})
+                except json.JSONDecodeError:
+                    print(f"Warning: {path} is corrupted. Google events will be fetched again.")
 
-def delete_event(service, event_id):
-    """Deletes an event from the Google Calendar."""
-    try:
-        service.events().delete(calendarId='primary', eventId=event_id).execute()
-        print(f"Event with ID {event_id} deleted.")
-    except HttpError as error:
-        print(f"An error occurred while deleting event ID {event_id}: {error}")
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"sync_token": self.sync_token, "time_min": self.time_min, "events": self.events}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def _list_pages(self, service, **params):
+        """Yields every page of an events().list call."""
+        page_token = None
+        while True:
+            result = _executor.execute(service.events().list(
+                calendarId='primary',
+                singleEvents=True,
+                maxResults=MAX_LIST_RESULTS,
+                fields=EVENT_SYNC_FIELDS,
+                pageToken=page_token,
+                **params
+            ))
+            yield result
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return
+
+    def sync(self, service, time_min, full=False):
+        """
+        Brings the mirror up to date and saves it.
+
+        Args:
+            service: The Google Calendar service.
+            time_min (str): RFC 3339 timestamp the mirror must cover events from.
+            full (bool): Ignore the stored sync token and list every event again.
+
+        Returns:
+            bool: True if the mirror is up to date, False if Google couldn't be reached.
+        """
+        if not full and self.sync_token and self.time_min and self.time_min <= time_min:
+            try:
+                changes = 0
+                for result in self._list_pages(service, syncToken=self.sync_token):
+                    for event in result.get('items', []):
+                        changes += 1
+                        if event.get('status') == 'cancelled':
+                            self.events.pop(event['id'], None)
+                        else:
+                            self.events[event['id']] = event
+                    self.sync_token = result.get('nextSyncToken', self.sync_token)
+                print(f"Fetched {changes} changes since the last sync.")
+                self.save()
+                return True
+            except HttpError as error:
+                if error.resp.status != 410:
+                    print(f"An error occurred while fetching events: {error}")
+                    return False
+                print("The sync token has expired, fetching every event again...")
 
+        try:
+            events = {}
+            sync_token = None
+            for result in self._list_pages(service, timeMin=time_min):
+                for event in result.get('items', []):
+                    if event.get('status') != 'cancelled':
+                        events[event['id']] = event
+                sync_token = result.get('nextSyncToken')
+        except HttpError as error:
+            print(f"An error occurred while fetching events: {error}")
+            return False
 
-def create_event(service, summary, start_time_obj, end_time_obj, date, user_email, time_zone, description):
-    """Creates an event in the Google Calendar."""
+        self.events = events
+        self.sync_token = sync_token
+        self.time_min = time_min
+        self.save()
+        return True
+
+    def events_between(self, min_date, max_date):
+        """Returns the mirrored events starting between two dates (inclusive)."""
+        selected = []
+        for event in self.events.values():
+            start = event.get('start', {})
+            start_date = (start.get('dateTime') or start.get('date') or '')[:10]
+            if min_date.isoformat() <= start_date <= max_date.isoformat():
+                selected.append(event)
+        return selected
+
+def build_event_body(summary, start_time_obj, end_time_obj, date, user_email, time_zone, description, private_properties=None):
+    """
+    Builds the Google Calendar event resource for a meeting, optionally with
+    private extended properties (only visible to this calendar).
+    """
 
     start_datetime = datetime.datetime.combine(date, start_time_obj)
     end_datetime = datetime.datetime.combine(date, end_time_obj)
@@ -151,6 +345,148 @@ def create_event(service, summary, start_time_obj, end_time_obj, date, user_emai
         ],
         'description': description,
     }
+    if private_properties:
+        event['extendedProperties'] = {'private': private_properties}
+    return event
+
+class BatchWriter:
+    """
+    Queues event inserts, updates and deletes and sends them to Google Calendar
+    through the batch endpoint, up to BATCH_SIZE calls per HTTP request.
+
+    Each queued call carries a tag (typically the meeting it was made for), which
+    is handed back with its result so callers can map errors to meetings.
+
+    Batches go through the shared executor, and calls of a batch that failed with a
+    quota or server error are queued again, up to the executor's max_retries.
+
+    Chunks can be sent from worker threads: take_chunk() and send() are thread-safe,
+    and each thread uses its own HTTP connection since httplib2 isn't.
+    """
+
+    def __init__(self, service, batch_size=BATCH_SIZE, auto_flush=True):
+        self.service = service
+        self.batch_size = min(batch_size, BATCH_SIZE)
+        self.auto_flush = auto_flush
+        self.results = []
+        self._queue = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def pending(self):
+        return len(self._queue)
+
+    def _add(self, action, summary, request, tag, attempt=0):
+        with self._lock:
+            self._queue.append((action, summary, request, tag, attempt))
+        if self.auto_flush and len(self._queue) >= self.batch_size:
+            self.flush()
+
+    def create_event(self, summary, start_time_obj, end_time_obj, date, user_email, time_zone, description, private_properties=None, tag=None):
+        """Queues the creation of an event."""
+        event = build_event_body(summary, start_time_obj, end_time_obj, date, user_email, time_zone, description, private_properties)
+        request = self.service.events().insert(calendarId='primary', body=event, sendUpdates='all')
+        self._add('create', summary, request, tag)
+
+    def patch_event(self, event_id, fields, summary, start_time_obj, end_time_obj, date, user_email, time_zone, description,
+                    private_properties=None, send_updates='all', tag=None):
+        """
+        Queues a patch of an existing event that only sends the given fields
+        (e.g. ['start', 'end']) and the private extended properties.
+        """
+        event_body = build_event_body(summary, start_time_obj, end_time_obj, date, user_email, time_zone, description, private_properties)
+        patch_body = {field: event_body[field] for field in fields if field in event_body}
+        if private_properties:
+            patch_body['extendedProperties'] = event_body['extendedProperties']
+        request = self.service.events().patch(calendarId='primary', eventId=event_id, body=patch_body, sendUpdates=send_updates)
+        self._add('patch', summary, request, tag)
+
+    def delete_event(self, event_id, summary=None, tag=None):
+        """Queues the deletion of an event."""
+        request = self.service.events().delete(calendarId='primary', eventId=event_id)
+        self._add('delete', summary or event_id, request, tag)
+
+    def take_chunk(self):
+        """Removes up to batch_size calls from the queue and returns them."""
+        with self._lock:
+            chunk, self._queue = self._queue[:self.batch_size], self._queue[self.batch_size:]
+        return chunk
+
+    def _http(self):
+        """Returns the HTTP connection for the current thread (None on the main thread, to use the service's)."""
+        if threading.current_thread() is threading.main_thread():
+            return None
+        if getattr(self._local, 'http', None) is None:
+            self._local.http = new_authorized_http(self.service)
+        return self._local.http
+
+    def send(self, chunk):
+        """
+        Sends a chunk of queued calls as one batch request.
+
+        Returns:
+            list: (action, tag, response, error) tuples for the calls that are done.
+                Calls that will be retried are queued again instead.
+        """
+        chunk_results = {}
+
+        def callback(request_id, response, exception):
+            chunk_results[int(request_id)] = (response, exception)
+
+        batch = new_batch_request(self.service, callback)
+        for index, (_, _, request, _, _) in enumerate(chunk):
+            batch.add(request, request_id=str(index))
+        batch_failed = False
+        start = time.perf_counter()
+        try:
+            with metrics.span("google.batch", calls=len(chunk)):
+                _executor.execute(batch, cost=len(chunk), http=self._http())
+        except HttpError as error:
+            # The whole batch request failed (after the executor's retries), report it for each call it carried
+            chunk_results = {index: (None, error) for index in range(len(chunk))}
+            batch_failed = True
+        elapsed = time.perf_counter() - start
+
+        sent = []
+        retry_error = None
+        retry_attempt = 0
+        for index, (action, summary, request, tag, attempt) in enumerate(chunk):
+            response, error = chunk_results.get(index, (None, None))
+            if not batch_failed and isinstance(error, HttpError) and is_retryable(error) and attempt < _executor.max_retries:
+                # Sent again with a later chunk, after backing off
+                with self._lock:
+                    self._queue.append((action, summary, request, tag, attempt + 1))
+                retry_error, retry_attempt = error, max(retry_attempt, attempt)
+                metrics.count("google.requeued", action=action)
+                continue
+            # The calls of a batch complete together, each one took the whole batch
+            metrics.record(f"google.{action}", elapsed, ok=error is None)
+            if error is not None:
+                print(f"An error occurred while trying to {action} event '{summary}': {error}")
+            elif action == 'delete':
+                print(f"Event '{summary}' deleted.")
+            else:
+                print(f"Event {action.rstrip('e')}ed: {response.get('htmlLink')}")
+            sent.append((action, tag, response, error))
+
+        if retry_error is not None:
+            if is_rate_limited(retry_error):
+                _executor.throttle()
+            _executor.backoff(retry_attempt, retry_error)
+
+        with self._lock:
+            self.results.extend(sent)
+        return sent
+
+    def flush(self):
+        """
+        Sends every queued call, in chunks of batch_size.
 
-    event = service.events().insert(calendarId='primary', body=event, sendUpdates='all').execute()
-    print(f"Event created: {event.get('htmlLink')}")
\ No newline at end of file
+        Returns:
+            list: (action, tag, response, error) tuples for the calls sent by this flush.
+        """
+        flushed = []
+        while self._queue:
+            flushed.extend(self.send(self.take_chunk()))
+        return flushed
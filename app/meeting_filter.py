@@ -0,0 +1,270 @@
+"""
+Compiled checks deciding which meetings are skipped: the ignore list, the
+cancellation prefixes Outlook adds to titles, and whether the user already is a
+participant. ScrapeFilter applies the checks that don't need an event's details
+while scraping, so those events aren't opened.
+
+The ignore list is compiled once into an Aho-Corasick automaton for its keywords
+and a single regular expression for its regex and glob rules (bar those referring
+to their own groups, matched alone), so checking a title costs the same whatever
+the length of the list. Inline global flags and named groups are rejected.
+
+Entries of the ignore list are either keywords (matched anywhere in the title,
+case-sensitive) or rules:
+
+    {"pattern": "standup", "ignore_case": true}
+    {"regex": "^\\[(OOO|PTO)\\]"}
+    {"glob": "Lunch*", "ignore_case": true}
+"""
+import fnmatch
+import json
+import re
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+
+from date_parsing import parse_date_string, parse_time_string
+
+# Prefixes Outlook adds to the title of cancelled meetings, in English and French
+CANCELLED_PREFIXES = ("Annulé : ", "Cancelled: ")
+
+CANCELLED_PATTERN = re.compile("|".join(re.escape(prefix) for prefix in CANCELLED_PREFIXES))
+
+# Backreferences and conditionals on group numbers, which shift once rules are combined
+GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?\(")
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton finding which of a set of keywords occur in a text, in a single pass."""
+
+    def __init__(self, keywords):
+        # Per node: transitions, failure link, and indexes of the keywords ending there
+        self.transitions = [{}]
+        self.failure = [0]
+        self.outputs = [[]]
+        for index, keyword in enumerate(keywords):
+            node = 0
+            for char in keyword:
+                if char not in self.transitions[node]:
+                    self.transitions.append({})
+                    self.failure.append(0)
+                    self.outputs.append([])
+                    self.transitions[node][char] = len(self.transitions) - 1
+                node = self.transitions[node][char]
+            self.outputs[node].append(index)
+
+        # Breadth-first, so the failure link of a node's parent is known before the node
+        queue = deque(self.transitions[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.transitions[node].items():
+                queue.append(child)
+                if node:
+                    fallback = self.failure[node]
+                    while fallback and char not in self.transitions[fallback]:
+                        fallback = self.failure[fallback]
+                    self.failure[child] = self.transitions[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.failure[child]]
+
+    def first(self, text):
+        """Returns the lowest index of the keywords occurring in text, or None."""
+        transitions, failure, outputs = self.transitions, self.failure, self.outputs
+        node = 0
+        found = None
+        for char in text:
+            while node and char not in transitions[node]:
+                node = failure[node]
+            node = transitions[node].get(char, 0)
+            if outputs[node]:
+                lowest = min(outputs[node])
+                found = lowest if found is None else min(found, lowest)
+        return found
+
+
+def _rule(entry):
+    """Returns (kind, pattern, ignore_case) for an ignore_list entry."""
+    if isinstance(entry, str):
+        return "text", entry, False
+    if not isinstance(entry, dict):
+        raise ValueError(f"invalid ignore_list entry {entry!r}")
+    ignore_case = bool(entry.get("ignore_case", False))
+    for kind in ("regex", "glob", "pattern"):
+        if kind in entry:
+            return ("text" if kind == "pattern" else kind), entry[kind], ignore_case
+    raise ValueError(f"ignore_list entry {entry!r} has no 'pattern', 'regex' or 'glob'")
+
+
+def _check_regex(pattern):
+    """Raises ValueError for a regex rule that can't be combined with the others."""
+    # Inline global flags are only allowed at the start of the whole alternation
+    try:
+        compiled = re.compile("(?:)" + pattern)
+    except re.error:
+        re.compile(pattern)
+        raise ValueError("inline global flags such as (?i) aren't supported, use \"ignore_case\" instead")
+    if compiled.groupindex:
+        raise ValueError("named groups aren't supported")
+
+
+def _label(entry):
+    return entry if isinstance(entry, str) else json.dumps(entry, ensure_ascii=False)
+
+
+class IgnoreMatcher:
+    """
+    Matches meeting titles against an ignore list, counting how many meetings each
+    rule ignored. When several rules match a title, the first one in the list is
+    counted.
+    """
+
+    def __init__(self, ignore_list):
+        self.rules = []
+        keywords, folded_keywords, patterns = [], [], []
+        # Rules matched on their own, (rule index, compiled pattern)
+        self._separate = []
+        self._keyword_rules, self._folded_rules = [], []
+        for entry in ignore_list or []:
+            try:
+                kind, pattern, ignore_case = _rule(entry)
+                if kind == "regex":
+                    _check_regex(pattern)
+            except (ValueError, re.error) as e:
+                print(f"Skipping ignore_list entry {_label(entry)}: {e}")
+                continue
+            index = len(self.rules)
+            self.rules.append(_label(entry))
+            if kind == "text" and not ignore_case:
+                keywords.append(pattern)
+                self._keyword_rules.append(index)
+            elif kind == "text":
+                folded_keywords.append(pattern.casefold())
+                self._folded_rules.append(index)
+            else:
+                regex = pattern if kind == "regex" else r"\A" + fnmatch.translate(pattern)
+                regex = f"(?i:{regex})" if ignore_case else regex
+                if GROUP_REFERENCE.search(regex):
+                    self._separate.append((index, re.compile(regex)))
+                else:
+                    # The group name tells which rule matched
+                    patterns.append((index, f"(?P<r{index}>{regex})"))
+        self._keywords = KeywordAutomaton(keywords) if keywords else None
+        self._folded = KeywordAutomaton(folded_keywords) if folded_keywords else None
+        self._patterns = None
+        if patterns:
+            try:
+                self._patterns = re.compile("|".join(regex for _, regex in patterns))
+            except re.error:
+                # Rules valid alone may still conflict once combined, they are then matched one by one
+                self._separate += [(index, re.compile(regex)) for index, regex in patterns]
+                self._separate.sort()
+        self.hits = Counter()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def reset(self):
+        """Forgets the hits counted so far, e.g. when a new sync starts."""
+        self.hits.clear()
+
+    def match(self, title):
+        """Returns the rule ignoring a title (as written in the ignore list), or None."""
+        candidates = []
+        if self._keywords is not None:
+            found = self._keywords.first(title)
+            if found is not None:
+                candidates.append(self._keyword_rules[found])
+        if self._folded is not None:
+            found = self._folded.first(title.casefold())
+            if found is not None:
+                candidates.append(self._folded_rules[found])
+        if self._patterns is not None:
+            match = self._patterns.search(title)
+            if match:
+                candidates.append(int(match.lastgroup[1:]))
+        for index, pattern in self._separate:
+            if candidates and index > min(candidates):
+                break
+            if pattern.search(title):
+                candidates.append(index)
+                break
+        if not candidates:
+            return None
+        index = min(candidates)
+        self.hits[index] += 1
+        return self.rules[index]
+
+    def unused(self):
+        return [rule for index, rule in enumerate(self.rules) if not self.hits[index]]
+
+    def summary(self):
+        used = ", ".join(f"{self.rules[index]} ({count})" for index, count in self.hits.most_common())
+        unused = ", ".join(self.unused())
+        return (f"Ignore list: {sum(self.hits.values())} meetings ignored by {len(self.hits)} of {len(self.rules)} rules"
+                f"{f': {used}' if used else ''}.{f' Never matched: {unused}.' if unused else ''}")
+
+
+@lru_cache(maxsize=8)
+def _compiled(key):
+    return IgnoreMatcher(json.loads(key))
+
+
+def get_ignore_matcher(ignore_list):
+    """
+    Returns the compiled matcher of an ignore list. It's compiled once per distinct
+    list, so every sync of a watch session shares it; reset() its hit counters when
+    a sync starts.
+    """
+    return _compiled(json.dumps(ignore_list or [], sort_keys=True))
+
+
+def split_cancelled(title):
+    """Returns the title without Outlook's cancellation prefix, and whether it had one."""
+    match = CANCELLED_PATTERN.match(title)
+    if not match:
+        return title, False
+    return title.replace(match.group(0), "").strip(), True
+
+
+def is_participant(email, participants):
+    """
+    Tells whether a lower-cased email is one of the participants. Only the
+    participants of the same length are lower-cased and compared.
+    """
+    return any(len(participant) == len(email) and participant.lower() == email for participant in participants)
+
+
+class ScrapeFilter:
+    """
+    Decides from what the calendar shows of an event (its title, date and times)
+    whether the scraper has to open it, before the details view is ever loaded.
+
+    Ignored and past meetings are dropped, since the sync would skip them anyway.
+    Cancelled meetings are kept without their details, which deleting them doesn't
+    need: the sync then only deletes the Google events it wrote itself. Whether
+    the user is a participant can only be told from the details, so that check is
+    left to the sync.
+    """
+
+    def __init__(self, ignore_list):
+        # Shared with the sync, so the hit counters cover both
+        self.ignore_matcher = get_ignore_matcher(ignore_list)
+
+    def check(self, title, date_str, start_time):
+        """
+        Returns (reason, message) for an event that doesn't need to be opened, reason
+        being 'ignored', 'cancelled' or 'past', or (None, None) to open it.
+        """
+        rule = self.ignore_matcher.match(title)
+        if rule is not None:
+            return "ignored", f"Event '{title}' matches the ignore_list entry {rule}. Skipping without opening it."
+        if split_cancelled(title)[1]:
+            return "cancelled", f"Event '{title}' is cancelled, its details aren't needed."
+        meeting_date = parse_date_string(date_str)
+        try:
+            start = parse_time_string(start_time)
+        except ValueError:
+            start = None
+        # Left to the sync if the date or time can't be parsed
+        if meeting_date and start and datetime.combine(meeting_date, start) < datetime.now():
+            return "past", f"Event '{title}' is in the past. Skipping without opening it."
+        return None, None
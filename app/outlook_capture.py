@@ -0,0 +1,219 @@
+"""
+Builds meeting records from the JSON responses Outlook on the web fetches while
+rendering the calendar, so events don't have to be clicked open one by one.
+
+OWA talks to several backends depending on the tenant (service.svc actions such as
+GetCalendarView/GetItem, the REST calendarview endpoint, startupdata). Rather than
+depending on one of them, every JSON payload is walked and any object that looks
+like a calendar item (it has a subject and a start) is collected.
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+from html_description import extract_body
+from meeting import Meeting
+
+# Only responses from these hosts are inspected
+OUTLOOK_HOSTS = ("outlook.office.com", "outlook.office365.com", "outlook.live.com")
+
+# Prefixes Outlook adds to the subject of a cancelled meeting
+CANCELLED_PREFIXES = ["Annulé : ", "Cancelled: "]
+
+
+def _first(item, *keys):
+    """Returns the first non-empty value found in item for the given keys."""
+    for key in keys:
+        value = item.get(key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def _parse_when(value):
+    """
+    Parses an OWA date/time value into a naive local datetime.
+    Accepts ISO strings or {"DateTime": ..., "TimeZone": ...} objects.
+    """
+    time_zone = None
+    if isinstance(value, dict):
+        time_zone = _first(value, "TimeZone", "timeZone")
+        value = _first(value, "DateTime", "dateTime")
+    if not isinstance(value, str):
+        return None
+
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+    if parsed.tzinfo is None and time_zone == "UTC":
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    if parsed.tzinfo is not None:
+        # Convert to the local time zone, which is what the calendar grid shows
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _attendee_address(attendee):
+    """Extracts the email address (or display name) of an attendee object."""
+    if not isinstance(attendee, dict):
+        return None
+    mailbox = _first(attendee, "Mailbox", "EmailAddress", "emailAddress") or attendee
+    if not isinstance(mailbox, dict):
+        return None
+    return _first(mailbox, "EmailAddress", "Address", "address", "Name", "name")
+
+
+def _looks_like_event(item):
+    return (
+        isinstance(item, dict)
+        and _first(item, "Subject", "subject") is not None
+        and _first(item, "Start", "start") is not None
+    )
+
+
+def _iter_events(payload):
+    """Yields every object in a JSON payload that looks like a calendar item."""
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if _looks_like_event(node):
+                yield node
+                continue
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+class OutlookResponseCapture:
+    """
+    Listens to a Playwright page's responses and accumulates calendar items.
+
+    Items are merged by their OWA id, so a later GetItem response carrying the body
+    and attendees enriches the entry created from the calendar view.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self.responses_seen = 0
+        # When the last response carrying calendar items was captured
+        self._last_items = None
+
+    def attach(self, page):
+        page.on("response", self.on_response)
+
+    def detach(self, page):
+        page.remove_listener("response", self.on_response)
+
+    async def on_response(self, response):
+        try:
+            if not any(host in response.url for host in OUTLOOK_HOSTS):
+                return
+            if response.request.resource_type not in ("xhr", "fetch"):
+                return
+            if "json" not in response.headers.get("content-type", ""):
+                return
+            payload = json.loads(await response.text())
+        except Exception:
+            # Redirects, aborted requests and non-JSON bodies are simply ignored
+            return
+
+        self.responses_seen += 1
+        self.add_payload(payload)
+
+    def add_payload(self, payload):
+        """Merges every calendar item found in payload into the capture."""
+        for item in _iter_events(payload):
+            self._add_item(item)
+            self._last_items = time.monotonic()
+
+    async def settled(self, quiet=0.3, timeout=3.0):
+        """
+        Waits until calendar items were captured and no more came for quiet seconds,
+        or for timeout seconds at most.
+
+        Returns:
+            bool: Whether calendar items were captured.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if self._last_items is not None and now - self._last_items >= quiet:
+                return True
+            if now >= deadline:
+                return self._last_items is not None
+            await asyncio.sleep(min(0.05, deadline - now))
+
+    def _add_item(self, item):
+        start = _parse_when(_first(item, "Start", "start"))
+        end = _parse_when(_first(item, "End", "end"))
+        if not start or not end:
+            return
+
+        title = str(_first(item, "Subject", "subject")).strip()
+        item_id = _first(item, "ItemId", "Id", "id")
+        if isinstance(item_id, dict):
+            item_id = item_id.get("Id")
+        key = item_id or (title, start.isoformat())
+
+        entry = self._items.setdefault(key, {
+            "title": title,
+            "start": start,
+            "end": end,
+            "description": None,
+            "participants": [],
+            # Whether a payload listed the attendees, even none
+            "attendees_seen": False,
+            "cancelled": False,
+        })
+
+        body = _first(item, "Body", "body", "UniqueBody")
+        if isinstance(body, dict):
+            body = _first(body, "Value", "Content", "content")
+        if isinstance(body, str) and body:
+            entry["description"] = extract_body(body)
+
+        attendees = []
+        for key_name in ("RequiredAttendees", "OptionalAttendees", "Attendees", "attendees"):
+            if key_name in item:
+                entry["attendees_seen"] = True
+            for attendee in item.get(key_name) or []:
+                address = _attendee_address(attendee)
+                if address and address not in attendees:
+                    attendees.append(address)
+        if attendees:
+            entry["participants"] = attendees
+
+        if _first(item, "IsCancelled", "isCancelled") or any(title.startswith(p) for p in CANCELLED_PREFIXES):
+            entry["cancelled"] = True
+
+    def meetings(self, with_description_only=False):
+        """
+        Returns the captured items as Meeting records, with ISO dates and 24-hour times.
+
+        Args:
+            with_description_only (bool): Only return items whose body and attendees were
+                captured, the others being left to open in the page. Cancelled items are
+                always returned since only their title is needed.
+        """
+        meetings = []
+        for entry in sorted(self._items.values(), key=lambda e: e["start"]):
+            complete = entry["description"] is not None and entry["attendees_seen"]
+            if with_description_only and not complete and not entry["cancelled"]:
+                continue
+            meetings.append(Meeting(
+                title=entry["title"],
+                date=entry["start"].date().isoformat(),
+                start_time=entry["start"].strftime("%H:%M"),
+                end_time=entry["end"].strftime("%H:%M"),
+                description=entry["description"] or "",
+                participants=list(entry["participants"]),
+                cancelled=entry["cancelled"],
+            ))
+        return meetings
+
+    def __len__(self):
+        return len(self._items)
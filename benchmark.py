@@ -0,0 +1,104 @@
+"""
+Offline benchmark of the Outlook scraper, replaying fixtures in a headless browser
+instead of logging in to Outlook (see fixtures.py).
+
+Examples:
+    python benchmark.py                              # Synthetic weeks of 10, 100 and 1000 events
+    python benchmark.py --capture network            # Same, reading events from the network responses
+    python benchmark.py --fixture fixtures/week.json # A session recorded with app.py --record-fixture
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+
+from adaptive_timeout import percentile
+from app import scrape_meetings
+from fixtures import install_replay, load_fixture, save_fixture, synthetic_fixture
+from meeting import Meeting
+
+
+def peak_rss_mb(who):
+    """Returns the peak resident memory of this process or of its largest child, in MB."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes on Linux
+    return peak / 1_000_000 if sys.platform == "darwin" else peak / 1000
+
+
+async def run_scenario(name, fixture, capture_mode, latency_ms):
+    """Scrapes a fixture once and returns the measurements of the run."""
+    from playwright.async_api import async_playwright
+
+    arrivals = []
+    # Every event is scraped, whatever the day the benchmark runs
+    user_config = {"capture_mode": capture_mode, "cache_ttl_hours": 0, "max_pages": 1, "scrape_prefilter": False}
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        context = await browser.new_context()
+        await install_replay(context, fixture, latency_ms=latency_ms, network=capture_mode == "network")
+        start = time.perf_counter()
+        await scrape_meetings(lambda meeting: arrivals.append(time.perf_counter()), "week", user_config, context=context)
+        elapsed = time.perf_counter() - start
+        await browser.close()
+
+    latencies = [(b - a) * 1000 for a, b in zip(arrivals, arrivals[1:])]
+    return {
+        "name": name,
+        "events": len(fixture["events"]),
+        "scraped": len(arrivals),
+        "seconds": elapsed,
+        "events_per_second": len(arrivals) / elapsed if elapsed else 0,
+        "p50": percentile(latencies, 0.5) if latencies else None,
+        "p95": percentile(latencies, 0.95) if latencies else None,
+        "p99": percentile(latencies, 0.99) if latencies else None,
+        "rss": peak_rss_mb(resource.RUSAGE_SELF),
+        "browser_rss": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def print_results(results):
+    print(f"\n{'scenario':<24} {'events':>7} {'scraped':>8} {'seconds':>8} {'events/s':>9} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'rss MB':>7} {'browser MB':>11}")
+    for r in results:
+        latencies = " ".join(f"{r[k]:>7.1f}" if r[k] is not None else f"{'-':>7}" for k in ("p50", "p95", "p99"))
+        print(f"{r['name']:<24} {r['events']:>7} {r['scraped']:>8} {r['seconds']:>8.2f} {r['events_per_second']:>9.1f} "
+              f"{latencies} {r['rss']:>7.0f} {r['browser_rss']:>11.0f}")
+    print("\nLatencies are the times between two scraped events. Memory is the peak so far, "
+          "for this process and for the largest browser process.")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Outlook scraper offline.")
+    parser.add_argument('--fixture', action='append', default=[],
+                        help="Fixture file to replay (can be repeated). Defaults to synthetic fixtures.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000],
+                        help="Number of events of the synthetic fixtures. Defaults to 10 100 1000.")
+    parser.add_argument('--capture', type=str, choices=['network', 'dom'], default='dom',
+                        help="Capture mode to benchmark. Defaults to 'dom', opening every event.")
+    parser.add_argument('--latency', type=int, default=20,
+                        help="Average delay in milliseconds of the replayed page's reactions. Defaults to 20.")
+    parser.add_argument('--write-fixtures', type=str, metavar='DIR',
+                        help="Also save the synthetic fixtures to this directory.")
+    args = parser.parse_args()
+
+    if args.fixture:
+        scenarios = [(os.path.basename(path), load_fixture(path)) for path in args.fixture]
+    else:
+        scenarios = [(f"synthetic-{size}", synthetic_fixture(size)) for size in sorted(args.sizes)]
+        if args.write_fixtures:
+            for name, fixture in scenarios:
+                save_fixture(os.path.join(args.write_fixtures, f"{name}.json"),
+                             [Meeting(**event) for event in fixture["events"]])
+
+    results = []
+    for name, fixture in scenarios:
+        print(f"\nBenchmarking {name} ({len(fixture['events'])} events, capture mode '{args.capture}')...")
+        results.append(await run_scenario(name, fixture, args.capture, args.latency))
+    print_results(results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,168 @@
+"""
+End-to-end benchmark of the Google Calendar sync, against the local fake of the
+API in fake_google.py instead of a Google account.
+
+Every size is synced three times: into an empty calendar, again without changes,
+and once more with a tenth of the meetings changed. The API calls of each scenario
+are compared with benchmarks/sync_calls.json, and the script fails if any count
+went up, so a change that makes the sync chattier is noticed.
+
+Examples:
+    python benchmark_sync.py                        # 10, 100, 1000 and 5000 events
+    python benchmark_sync.py --latency 50           # With 50 ms per HTTP request
+    python benchmark_sync.py --error-rate 0.05      # With 5% of the calls hitting the quota
+    python benchmark_sync.py --update-baseline      # Accept the current call counts
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from app import update_meetings
+from fake_google import FakeCalendar, FakeGoogleServer
+from fixtures import synthetic_fixture
+from meeting import Meeting
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "sync_calls.json")
+
+
+def week_of_meetings(count):
+    """Returns count synthetic meetings next week, so none of them is skipped as past."""
+    fixture = synthetic_fixture(count, start=date.today() + timedelta(days=7))
+    return [Meeting(**event) for event in fixture["events"]]
+
+
+def changed(meetings, fraction=0.1):
+    """Returns copies of the meetings with the description of a fraction of them changed."""
+    step = max(1, round(1 / fraction))
+    return [
+        Meeting(m.title, m.date, m.start_time, m.end_time, m.description + ("<p>Moved to room B.</p>" if i % step == 0 else ""),
+                m.participants)
+        for i, m in enumerate(meetings)
+    ]
+
+
+def run_scenarios(size, latency_ms, error_rate, verbose):
+    """Syncs size meetings in the three scenarios and returns their measurements."""
+    calendar = FakeCalendar(error_rate=error_rate)
+    server = FakeGoogleServer(calendar, latency_ms=latency_ms).start()
+    user_config = {
+        "google_base_url": server.base_url,
+        "user_email": calendar.email,
+        "ignore_list": [],
+        # The fake has no quota, only the simulated errors
+        "google_rate_limit": 1000,
+        "google_retry_delay": 0.01,
+    }
+    meetings = week_of_meetings(size)
+    results = []
+    cwd = os.getcwd()
+    # The sync state and the event mirror are kept in the working directory
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for name, scenario in (("initial", meetings), ("unchanged", meetings), ("10% changed", changed(meetings))):
+                before = calendar.calls.copy()
+                output = io.StringIO()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(sys.stdout if verbose else output):
+                    update_meetings(scenario, user_config)
+                elapsed = time.perf_counter() - start
+                calls = calendar.calls - before
+                results.append({
+                    "name": f"{size} {name}",
+                    "seconds": elapsed,
+                    "events": len([e for e in calendar.events.values() if e.get("status") != "cancelled"]),
+                    "calls": dict(sorted(calls.items())),
+                })
+        finally:
+            os.chdir(cwd)
+            server.stop()
+    return results
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({r["name"]: r["calls"] for r in results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baseline):
+    """Returns the calls that increased from the baseline, as messages."""
+    increases = []
+    for r in results:
+        expected = baseline.get(r["name"])
+        if expected is None:
+            continue
+        for method, count in r["calls"].items():
+            if method == "quota_errors":
+                continue
+            if count > expected.get(method, 0):
+                increases.append(f"{r['name']}: {method} went from {expected.get(method, 0)} to {count} calls")
+    return increases
+
+
+def print_results(results):
+    print(f"\n{'scenario':<20} {'seconds':>8} {'events':>7} {'calls':>6}  per method")
+    for r in results:
+        total = sum(count for method, count in r["calls"].items() if method != "quota_errors")
+        methods = ", ".join(f"{method}: {count}" for method, count in r["calls"].items())
+        print(f"{r['name']:<20} {r['seconds']:>8.2f} {r['events']:>7} {total:>6}  {methods}")
+    print("\nBatch requests count once as 'batch', plus once per call they contain.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Google Calendar sync against a local fake of the API.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000],
+                        help="Number of meetings to sync. Defaults to 10 100 1000 5000.")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Delay in milliseconds added to every HTTP request. Defaults to 0.")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of the API calls answered with a quota error. Defaults to 0.")
+    parser.add_argument('--baseline', type=str, default=BASELINE_PATH,
+                        help="File of the expected call counts. Defaults to benchmarks/sync_calls.json.")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Save the call counts of this run as the new baseline.")
+    parser.add_argument('--verbose', action='store_true', help="Show the output of the syncs.")
+    args = parser.parse_args()
+
+    results = []
+    for size in sorted(args.sizes):
+        print(f"Syncing {size} meetings...")
+        results.extend(run_scenarios(size, args.latency, args.error_rate, args.verbose))
+    print_results(results)
+
+    if args.error_rate:
+        # Retried calls depend on which ones failed, the baseline is for runs without errors
+        print("\nNot compared with the baseline, since quota errors add retries.")
+        return
+
+    if args.update_baseline:
+        save_baseline(args.baseline, results)
+        print(f"\nSaved the call counts to {args.baseline}.")
+        return
+
+    increases = compare(results, load_baseline(args.baseline))
+    if increases:
+        print("\nThe sync makes more API calls than the baseline:")
+        for increase in increases:
+            print(f"  - {increase}")
+        sys.exit(1)
+    print("\nNo scenario makes more API calls than the baseline.")
+
+
+if __name__ == "__main__":
+    main()
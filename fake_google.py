@@ -0,0 +1,271 @@
+"""
+In-process stand-in for the Google Calendar API, to run syncs end to end without
+a Google account (see benchmark_sync.py).
+
+It implements what CalSync uses: events list (with pagination and sync tokens),
+insert, update, patch and delete, calendars get, userinfo and the batch endpoint.
+Latency and quota errors can be simulated, and every call is counted.
+
+Point CalSync at it with "google_base_url" in the user config.
+"""
+import email.parser
+import itertools
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/([^/]+)/events(?:/([^/]+))?$")
+CALENDAR_PATH = re.compile(r"^/calendar/v3/calendars/([^/]+)$")
+
+
+def _parse_time(value):
+    """Parses an RFC 3339 timestamp, or an event's naive dateTime (taken as UTC)."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _error(status, reason, message):
+    return status, {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+
+class FakeCalendar:
+    """
+    The calendar's state and the API calls on it, independent of HTTP.
+
+    Args:
+        email (str): Address returned by userinfo.
+        time_zone (str): Time zone of the primary calendar.
+        page_size (int): Maximum number of events per page of events().list.
+        error_rate (float): Fraction of calls answered with a quota error (403 rateLimitExceeded).
+        seed (int): Seed of the quota errors, so runs are reproducible.
+    """
+
+    def __init__(self, email="user@example.com", time_zone="Europe/Paris", page_size=250, error_rate=0.0, seed=0):
+        self.email = email
+        self.time_zone = time_zone
+        self.page_size = page_size
+        self.error_rate = error_rate
+        self.events = {}
+        self.calls = Counter()
+        self._changes = itertools.count(1)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(self, method, path, query, body):
+        """Handles an API call. Returns (status, JSON response or None)."""
+        with self._lock:
+            name, handler, args = self._route(method, path)
+            self.calls[name] += 1
+            if handler is None:
+                return _error(404, "notFound", f"No fake for {method} {path}")
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.calls["quota_errors"] += 1
+                return _error(403, "rateLimitExceeded", "Rate Limit Exceeded")
+            return handler(query, body, *args)
+
+    def _route(self, method, path):
+        if path == "/oauth2/v2/userinfo" and method == "GET":
+            return "userinfo.get", self._userinfo, ()
+        match = CALENDAR_PATH.match(path)
+        if match and method == "GET":
+            return "calendars.get", self._calendar, ()
+        match = EVENTS_PATH.match(path)
+        if match:
+            event_id = match.group(2)
+            if event_id is None:
+                return {"GET": ("events.list", self._list, ()), "POST": ("events.insert", self._insert, ())}.get(
+                    method, (f"{method} {path}", None, ()))
+            handlers = {"PUT": ("events.update", self._update), "PATCH": ("events.patch", self._patch),
+                        "DELETE": ("events.delete", self._delete), "GET": ("events.get", self._get)}
+            if method in handlers:
+                name, handler = handlers[method]
+                return name, handler, (event_id,)
+        return f"{method} {path}", None, ()
+
+    def _userinfo(self, query, body):
+        return 200, {"email": self.email}
+
+    def _calendar(self, query, body):
+        return 200, {"id": "primary", "timeZone": self.time_zone}
+
+    def _touch(self, event):
+        event["etag"] = f'"{uuid.uuid4().hex}"'
+        event["updated"] = next(self._changes)
+        return event
+
+    def _public(self, event):
+        return {key: value for key, value in event.items() if key != "updated"}
+
+    def _list(self, query, body):
+        sync_token = query.get("syncToken")
+        offset = int(query.get("pageToken") or 0)
+        max_results = min(int(query.get("maxResults", 250)), self.page_size)
+
+        if sync_token:
+            if not sync_token.isdigit():
+                return _error(410, "fullSyncRequired", "Sync token is no longer valid")
+            # Every change since the token, deleted events included
+            events = [e for e in self.events.values() if e["updated"] > int(sync_token)]
+        else:
+            time_min = _parse_time(query["timeMin"]) if "timeMin" in query else None
+            time_max = _parse_time(query["timeMax"]) if "timeMax" in query else None
+            events = []
+            for event in self.events.values():
+                if event.get("status") == "cancelled":
+                    continue
+                start = _parse_time(event["start"]["dateTime"])
+                if (time_min and start < time_min) or (time_max and start >= time_max):
+                    continue
+                events.append(event)
+        events.sort(key=lambda e: (e.get("start", {}).get("dateTime", ""), e["id"]))
+
+        page = events[offset:offset + max_results]
+        response = {"items": [self._public(event) for event in page]}
+        if offset + max_results < len(events):
+            response["nextPageToken"] = str(offset + max_results)
+        else:
+            response["nextSyncToken"] = str(max((e["updated"] for e in self.events.values()), default=0))
+        return 200, response
+
+    def _insert(self, query, body):
+        event_id = uuid.uuid4().hex
+        event = dict(body, id=event_id, status="confirmed", htmlLink=f"https://calendar.example.com/event?eid={event_id}")
+        self.events[event_id] = self._touch(event)
+        return 200, self._public(event)
+
+    def _get(self, query, body, event_id):
+        event = self.events.get(event_id)
+        if event is None or event.get("status") == "cancelled":
+            return _error(404, "notFound", "Not Found")
+        return 200, self._public(event)
+
+    def _update(self, query, body, event_id):
+        event = self.events.get(event_id)
+        if event is None or event.get("status") == "cancelled":
+            return _error(404, "notFound", "Not Found")
+        event = dict(body, id=event_id, status="confirmed", htmlLink=event["htmlLink"])
+        self.events[event_id] = self._touch(event)
+        return 200, self._public(event)
+
+    def _patch(self, query, body, event_id):
+        event = self.events.get(event_id)
+        if event is None or event.get("status") == "cancelled":
+            return _error(404, "notFound", "Not Found")
+        for key, value in body.items():
+            if key == "extendedProperties":
+                private = event.setdefault("extendedProperties", {}).setdefault("private", {})
+                private.update(value.get("private", {}))
+            else:
+                event[key] = value
+        self._touch(event)
+        return 200, self._public(event)
+
+    def _delete(self, query, body, event_id):
+        event = self.events.get(event_id)
+        if event is None or event.get("status") == "cancelled":
+            return _error(410, "deleted", "Resource has been deleted")
+        # Kept as cancelled, so incremental syncs report the deletion
+        self._touch(event)["status"] = "cancelled"
+        return 204, None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, payload, content_type="application/json; charset=UTF-8"):
+        body = payload if isinstance(payload, bytes) else (json.dumps(payload).encode("utf-8") if payload is not None else b"")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        server = self.server.fake
+        if server.latency:
+            time.sleep(server.latency)
+        url = urlparse(self.path)
+        raw_body = self._read_body()
+        if url.path.startswith("/batch/"):
+            server.calendar.calls["batch"] += 1
+            content_type, body = server.batch(self.headers.get("Content-Type", ""), raw_body)
+            self._send(200, body, content_type)
+            return
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, payload = server.calendar.call(self.command, url.path, query, json.loads(raw_body) if raw_body else {})
+        self._send(status, payload)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+
+class FakeGoogleServer:
+    """
+    Serves a FakeCalendar over HTTP on a local port, from a background thread.
+
+    Args:
+        calendar (FakeCalendar, optional): The calendar to serve, a new one by default.
+        latency_ms (float): Delay added to every HTTP request (a batch counts as one).
+    """
+
+    def __init__(self, calendar=None, latency_ms=0):
+        self.calendar = calendar or FakeCalendar()
+        self.latency = latency_ms / 1000
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def batch(self, content_type, raw_body):
+        """Answers a multipart/mixed batch request. Returns the response content type and body."""
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + raw_body
+        )
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.get_payload():
+            request = part.get_payload()
+            head, _, body = request.partition("\r\n\r\n") if "\r\n\r\n" in request else request.partition("\n\n")
+            request_line = head.splitlines()[0]
+            method, target, _ = request_line.split(" ", 2)
+            url = urlparse(target)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            status, payload = self.calendar.call(method, url.path, query, json.loads(body) if body.strip() else {})
+            content_id = part.get("Content-ID", "<+0>")
+            parts.append(
+                f"--{boundary}\r\n"
+                "Content-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 400 else 'Error'}\r\n"
+                "Content-Type: application/json; charset=UTF-8\r\n\r\n"
+                f"{json.dumps(payload) if payload is not None else ''}\r\n"
+            )
+        body = "".join(parts) + f"--{boundary}--\r\n"
+        return f"multipart/mixed; boundary={boundary}", body.encode("utf-8")
@@ -0,0 +1,113 @@
+"""
+Normalisation of the HTML descriptions of Outlook events, in a single pass of one
+compiled pattern over the body.
+
+Paragraphs, divs and line breaks all become a single '<br>', runs of them (and the
+whitespace around them) collapse into one, and the breaks and whitespace at both
+ends are dropped. Other tags and the text are kept as they are. The canonical form,
+used to hash and compare descriptions with what Google Calendar stores, also
+collapses the remaining whitespace.
+
+Outlook bodies can carry large signatures and inline HTML, so the result can be
+capped to a number of bytes: only the beginning of the body is normalised, and a
+marker is appended where it was cut.
+
+Bodies read from OWA's responses are whole HTML documents; extract_body keeps what
+is inside their <body>.
+"""
+import re
+
+# A run of paragraph, div and line break tags, opening or closing, with the whitespace around them.
+# It only starts where the whitespace does, so long whitespace isn't rescanned from every position.
+BREAKS = re.compile(r"(?<!\s)\s*(?:<(?:/?(?:p|div)|/?br)\b[^>]*>\s*)+", re.IGNORECASE)
+
+WHITESPACE = re.compile(r"\s+")
+
+BODY_START = re.compile(r"<body\b[^>]*>", re.IGNORECASE)
+BODY_END = re.compile(r"</body\s*>", re.IGNORECASE)
+
+# Parts of a document that aren't displayed: head, styles, scripts, comments and stray meta tags
+HIDDEN = re.compile(
+    r"<(head|style|script|title)\b[^>]*>.*?</\1\s*>|<!--.*?-->|<!DOCTYPE[^>]*>|</?(?:html|meta|link)\b[^>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+# Appended to a description cut to the byte cap
+TRUNCATION_MARKER = "…"
+
+
+def _normalize(html, canonical):
+    description = BREAKS.sub("<br>", html)
+    if canonical:
+        description = WHITESPACE.sub(" ", description)
+    description = description.strip()
+    # Runs are collapsed, so there is at most one break at each end
+    if description.startswith("<br>"):
+        description = description[4:].lstrip()
+    if description.endswith("<br>"):
+        description = description[:-4].rstrip()
+    return description
+
+
+def _cut(description, max_bytes):
+    """
+    Returns the longest prefix of a description fitting in max_bytes of UTF-8,
+    without splitting a tag or an entity, and without a break at its end.
+    """
+    cut = description.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")
+    for opening, closing in (("<", ">"), ("&", ";")):
+        start = cut.rfind(opening)
+        if start != -1 and closing not in cut[start:]:
+            cut = cut[:start]
+    cut = cut.rstrip()
+    while cut.endswith("<br>"):
+        cut = cut[:-4].rstrip()
+    return cut
+
+
+def extract_body(html):
+    """
+    Returns the content of the <body> of an HTML document, without its head,
+    styles, scripts and comments. A fragment is only stripped of those.
+    """
+    if not html:
+        return ""
+    start = BODY_START.search(html)
+    if start:
+        end = BODY_END.search(html, start.end())
+        html = html[start.end():end.start() if end else len(html)]
+    return HIDDEN.sub("", html)
+
+
+def normalize_description(html, max_bytes=0, canonical=False, marker=TRUNCATION_MARKER):
+    """
+    Normalises an HTML description into a compact, <br>-separated form.
+
+    Args:
+        html (str): The description as scraped or as stored by Google.
+        max_bytes (int): Maximum size of the result in UTF-8 bytes, marker included.
+            0 keeps the whole description.
+        canonical (bool): Also collapse every run of whitespace into a single space,
+            for hashing and comparisons.
+        marker (str): Appended to a description cut to max_bytes.
+
+    Returns:
+        str: The normalised description.
+    """
+    if not html:
+        return ""
+    if not max_bytes:
+        return _normalize(html, canonical)
+
+    # Only the beginning of the body is normalised, a larger part of it as long as
+    # the result fits in the cap. Parts end after a tag rather than inside one.
+    window = max(1024, 2 * max_bytes)
+    while True:
+        end = len(html) if window >= len(html) else (html.rfind(">", 0, window) + 1 or window)
+        description = _normalize(html[:end], canonical)
+        size = len(description.encode("utf-8"))
+        if size > max_bytes:
+            return _cut(description, max(0, max_bytes - len(marker.encode("utf-8")))) + marker
+        if end == len(html):
+            return description
+        window *= 2
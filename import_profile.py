@@ -0,0 +1,63 @@
+"""
+Measures how long each module takes to import, for the --import-profile option.
+
+Like python -X importtime, every import is timed while the profiler is active,
+both including (cumulative) and excluding (self) the modules it imported in turn.
+"""
+import builtins
+import importlib.util
+import sys
+import threading
+import time
+
+
+class ImportProfiler:
+    """Wraps builtins.__import__ to time the modules imported for the first time."""
+
+    def __init__(self):
+        # Module name -> [self seconds, cumulative seconds]
+        self.timings = {}
+        self._local = threading.local()
+        self._original_import = None
+
+    def start(self):
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def stop(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        module_name = name
+        if level:
+            try:
+                module_name = importlib.util.resolve_name("." * level + name, (globals or {}).get("__package__"))
+            except (ImportError, ValueError):
+                pass
+        if module_name in sys.modules:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        # Time spent in nested imports, subtracted from this module's self time
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            timing = self.timings.setdefault(module_name, [0.0, 0.0])
+            timing[0] += elapsed - nested
+            timing[1] += elapsed
+
+    def report(self, limit=25):
+        """Prints the slowest imports, by cumulative time."""
+        timings = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+        print(f"\nImport times ({len(timings)} modules, slowest {min(limit, len(timings))} shown):")
+        print(f"{'self (ms)':>10} {'cumulative (ms)':>16}  module")
+        for module_name, (self_time, cumulative) in timings[:limit]:
+            print(f"{self_time * 1000:>10.1f} {cumulative * 1000:>16.1f}  {module_name}")
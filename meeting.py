@@ -0,0 +1,45 @@
+"""
+Record of a meeting scraped from the Outlook calendar.
+"""
+from dataclasses import dataclass, field
+from datetime import date, time
+
+from date_parsing import parse_date_string, parse_time_string
+
+
+@dataclass
+class Meeting:
+    """
+    A meeting as scraped from Outlook. The date and times are kept as displayed
+    (e.g. 'Monday, July 21, 2025' and '2:30 PM'), or in ISO format when they were
+    read from the calendar's network responses.
+
+    cancelled marks meetings Outlook reported as cancelled, which may come
+    without their details (participants included).
+
+    parse() fills meeting_date, start and end with the parsed values.
+    """
+    title: str
+    date: str
+    start_time: str
+    end_time: str
+    description: str = ""
+    participants: list = field(default_factory=list)
+    cancelled: bool = False
+    meeting_date: date = field(default=None, compare=False, repr=False)
+    start: time = field(default=None, compare=False, repr=False)
+    end: time = field(default=None, compare=False, repr=False)
+
+    def parse(self):
+        """
+        Parses the date and times once, keeping the result on the record.
+        Raises ValueError if they can't be parsed.
+        """
+        if self.meeting_date is None:
+            meeting_date = parse_date_string(self.date)
+            if not meeting_date:
+                raise ValueError(f"unknown date format '{self.date}'")
+            self.start = parse_time_string(self.start_time)
+            self.end = parse_time_string(self.end_time)
+            self.meeting_date = meeting_date
+        return self
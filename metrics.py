@@ -0,0 +1,143 @@
+"""
+Timings and counters of a sync run: spans around each stage (configuration,
+browser, Outlook login, events, Google authentication, listing and writes),
+written to a JSON lines file, printed as a summary table and optionally exported
+as a Prometheus textfile for the node exporter's textfile collector.
+"""
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+from adaptive_timeout import percentile
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _prometheus_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _prometheus_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{_prometheus_name(key)}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Collects the spans and counters of a run. Spans and counters can be recorded
+    from any thread (e.g. the Google writer threads).
+
+    Spans are named '<area>.<stage>' (e.g. 'google.list') and may carry labels,
+    which are kept in the JSON lines but not used to group the summary table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Starts a new run, forgetting what was recorded so far."""
+        with self._lock:
+            self.run_id = uuid.uuid4().hex[:12]
+            self.started = time.time()
+            self.spans = []
+            self.counters = Counter()
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Times the enclosed block. A block that raises is recorded with an
+        'error' label holding the exception's type.
+        """
+        start = time.perf_counter()
+        try:
+            yield labels
+        except BaseException as e:
+            labels["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, **labels)
+
+    def record(self, name, seconds, **labels):
+        """Records a span measured elsewhere."""
+        with self._lock:
+            self.spans.append({"name": name, "seconds": seconds, "at": time.time(), **labels})
+
+    def count(self, name, value=1, **labels):
+        with self._lock:
+            self.counters[(name, _label_key(labels))] += value
+
+    def stages(self):
+        """Returns {span name: durations in seconds}, in the order the stages first ran."""
+        stages = {}
+        for span in self.spans:
+            stages.setdefault(span["name"], []).append(span["seconds"])
+        return stages
+
+    def write_jsonl(self, path):
+        """Appends the run's spans and counters to a JSON lines file, one record per line."""
+        with self._lock:
+            spans, counters = list(self.spans), dict(self.counters)
+        directory = os.path.dirname(str(path))
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "a") as f:
+            for span in spans:
+                f.write(json.dumps({"type": "span", "run": self.run_id, **span}, ensure_ascii=False) + "\n")
+            for (name, labels), value in counters.items():
+                f.write(json.dumps({"type": "counter", "run": self.run_id, "name": name, "value": value, **dict(labels)},
+                                   ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path, prefix="calsync"):
+        """
+        Writes the run as a Prometheus textfile. The file is replaced atomically,
+        so the node exporter never reads it half written.
+        """
+        lines = [
+            f"# HELP {prefix}_last_run_timestamp_seconds When the last sync started.",
+            f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+            f"{prefix}_last_run_timestamp_seconds {self.started:.3f}",
+            f"# HELP {prefix}_stage_seconds Time spent in each stage of the last sync.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for name, durations in self.stages().items():
+            labels = _prometheus_labels((("stage", name),))
+            lines.append(f"{prefix}_stage_seconds_sum{labels} {sum(durations):.6f}")
+            lines.append(f"{prefix}_stage_seconds_count{labels} {len(durations)}")
+        lines += [
+            f"# HELP {prefix}_events Counters of the last sync.",
+            f"# TYPE {prefix}_events gauge",
+        ]
+        for (name, labels), value in sorted(self.counters.items(), key=lambda item: str(item[0])):
+            lines.append(f"{prefix}_events{_prometheus_labels((('name', name),) + labels)} {value}")
+
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temporary, path)
+
+    def summary(self):
+        """Returns the summary table of the run, one row per stage, then the counters."""
+        rows = [f"{'stage':<26} {'count':>6} {'total s':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"]
+        for name, durations in self.stages().items():
+            rows.append(f"{name:<26} {len(durations):>6} {sum(durations):>8.2f} {percentile(durations, 0.5) * 1000:>8.0f} "
+                        f"{percentile(durations, 0.95) * 1000:>8.0f} {max(durations) * 1000:>8.0f}")
+        if self.counters:
+            rows.append("")
+            for (name, labels), value in sorted(self.counters.items(), key=lambda item: str(item[0])):
+                label_text = ", ".join(f"{key}={label}" for key, label in labels)
+                rows.append(f"{name + (f' ({label_text})' if label_text else ''):<42} {value:>6}")
+        return "\n".join(rows)
+
+
+# Shared by every module of a run, see app.report_metrics
+metrics = Metrics()
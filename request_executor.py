@@ -0,0 +1,131 @@
+"""
+Shared executor for Google API requests: token-bucket rate limiting, a cap on
+concurrent requests, and retries with exponential backoff and jitter for quota
+and server errors.
+"""
+import json
+import random
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+from metrics import metrics
+
+# Reasons Google gives for quota errors that are worth retrying (they come with a 403)
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+
+def _error_reasons(error):
+    """Returns the 'reason' strings of an HttpError."""
+    details = getattr(error, "error_details", None)
+    details = list(details) if isinstance(details, list) else []
+    try:
+        details += json.loads(error.content.decode("utf-8")).get("error", {}).get("errors", [])
+    except (AttributeError, ValueError):
+        pass
+    return [detail.get("reason") for detail in details if isinstance(detail, dict)]
+
+
+def is_rate_limited(error):
+    status = error.resp.status if error.resp is not None else None
+    return status == 429 or (status == 403 and any(reason in RATE_LIMIT_REASONS for reason in _error_reasons(error)))
+
+
+def is_retryable(error):
+    """Tells whether an HttpError is a quota or server error that may succeed later."""
+    status = error.resp.status if error.resp is not None else None
+    return is_rate_limited(error) or (status is not None and status >= 500)
+
+
+def retry_after(error):
+    """Returns the delay requested by a Retry-After header, in seconds, if any."""
+    if error.resp is None:
+        return None
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestExecutor:
+    """
+    Runs googleapiclient requests under a token bucket (rate requests per second,
+    up to burst at once) and at most max_concurrency at a time.
+
+    The rate adapts to the quota: it is halved whenever Google answers with a
+    rate limit error and slowly grows back to its configured value on success.
+    """
+
+    def __init__(self, rate=10.0, burst=10, max_concurrency=4, max_retries=5, base_delay=1.0, max_delay=64.0):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until the bucket held enough tokens for the given number of calls.
+        A cost larger than burst (e.g. a batch) is taken in installments of up to
+        burst, so it still runs at the configured rate.
+        """
+        while tokens > 0:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                installment = min(tokens, self.burst)
+                if self._tokens >= installment:
+                    self._tokens -= installment
+                    tokens -= installment
+                    continue
+                wait = (installment - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, attempt, error=None):
+        """Sleeps before a retry, honouring Retry-After when Google sends it."""
+        delay = retry_after(error) if error is not None else None
+        if delay is None:
+            # Exponential backoff with full jitter
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self.retries += 1
+        time.sleep(delay)
+
+    def throttle(self):
+        """Slows down after a rate limit error."""
+        with self._lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def _recover(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+    def execute(self, request, cost=1, **kwargs):
+        """
+        Executes a request (or a batch of cost calls), retrying quota and server errors.
+        Other errors, or the last one once retries are exhausted, are raised.
+        """
+        attempt = 0
+        while True:
+            self.acquire(cost)
+            try:
+                with self._slots:
+                    response = request.execute(**kwargs)
+                self._recover()
+                return response
+            except HttpError as error:
+                if not is_retryable(error) or attempt >= self.max_retries:
+                    metrics.count("google.errors", status=error.resp.status if error.resp is not None else None)
+                    raise
+                metrics.count("google.retries", reason="quota" if is_rate_limited(error) else "server")
+                if is_rate_limited(error):
+                    self.throttle()
+                self.backoff(attempt, error)
+                attempt += 1
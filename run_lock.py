@@ -0,0 +1,54 @@
+"""
+Lock file preventing two CalSync runs (for instance the watch mode and a click
+on the app) from scraping and syncing at the same time.
+"""
+import os
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows, where runs simply aren't locked
+    fcntl = None
+
+
+class RunLock:
+    """
+    An exclusive lock on a file, held for the duration of a run. The lock is
+    released by the system if the process dies, so it can't go stale.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """Takes the lock without waiting. Returns whether it was acquired."""
+        self._file = open(self.path, "a+")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._file.close()
+                self._file = None
+                return False
+        # Record who holds the lock, for the message shown to other runs
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return True
+
+    def owner(self):
+        """Returns the process id recorded by the holder of the lock, if any."""
+        try:
+            with open(self.path, "r") as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def release(self):
+        if self._file is not None:
+            if fcntl is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -0,0 +1,101 @@
+"""
+Profiles a whole sync run, for the --profile option.
+
+Two profiles are taken at once:
+- cProfile, deterministic, on the event loop's thread. It covers the scraping and
+  every async task, and is saved as a pstats file (python -m pstats, snakeviz).
+- A sampler walking the stacks of every thread, including the Google writer threads
+  cProfile doesn't see, saved as collapsed stacks ('frame;frame;frame count' lines)
+  that flamegraph.pl, speedscope or inferno turn into a flame graph.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of every thread every interval seconds, from a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class RunProfiler:
+    """
+    Runs cProfile and the stack sampler between start() and stop(), then saves
+    both profiles to directory as calsync-<timestamp>.pstats and .collapsed.
+    """
+
+    def __init__(self, directory, interval=0.005):
+        self.directory = directory
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(interval)
+        self.paths = None
+
+    def start(self):
+        self.sampler.start()
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+        self.sampler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        name = os.path.join(str(self.directory), f"calsync-{datetime.now():%Y%m%d-%H%M%S}")
+        self.paths = (f"{name}.pstats", f"{name}.collapsed")
+        self.profile.dump_stats(self.paths[0])
+        self.sampler.write_collapsed(self.paths[1])
+
+    def report(self, limit=20):
+        """Prints the functions with the most cumulative time, and where the profiles were saved."""
+        output = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=output)
+        stats.sort_stats("cumulative").print_stats(limit)
+        print(f"\nProfile of the run (top {limit} functions by cumulative time, event loop thread):")
+        # Skip the header pstats writes before the table
+        print(output.getvalue().split("\n\n", 1)[-1].rstrip())
+        if self.paths:
+            print(f"\nSaved the profile to {self.paths[0]} and {self.sampler.samples} stack samples of every thread "
+                  f"to {self.paths[1]}.")
@@ -0,0 +1,60 @@
+"""
+On-disk cache of the event details scraped from Outlook, so that events that
+haven't changed since the last sync don't have to be opened again.
+"""
+import json
+import os
+import time
+
+
+class ScrapeCache:
+    """
+    Maps an event fingerprint (its title, time range and date, as shown in the
+    calendar's aria-label) to the description and participants scraped for it.
+
+    Entries older than the TTL are treated as missing and dropped on save.
+    """
+
+    def __init__(self, path, ttl_hours=12):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                try:
+                    self._entries = json.load(f)
+                except json.JSONDecodeError:
+                    print(f"Warning: {path} is corrupted. The scrape cache will be rebuilt.")
+
+    @staticmethod
+    def fingerprint(title, start_time, end_time, date_str):
+        return f"{title}|{start_time}|{end_time}|{date_str}"
+
+    def _is_fresh(self, entry):
+        return time.time() - entry.get("scraped_at", 0) < self.ttl
+
+    def get(self, fingerprint):
+        """Returns the cached details for a fingerprint, or None if missing or expired."""
+        entry = self._entries.get(fingerprint)
+        if entry and self._is_fresh(entry):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def put(self, fingerprint, description, participants):
+        self._entries[fingerprint] = {
+            "description": description,
+            "participants": participants,
+            "scraped_at": time.time(),
+        }
+
+    def save(self):
+        """Writes the cache back to disk, dropping expired entries."""
+        self._entries = {k: v for k, v in self._entries.items() if self._is_fresh(v)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
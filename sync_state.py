@@ -0,0 +1,109 @@
+"""
+SQLite store remembering which Google Calendar event each Outlook meeting was
+synced to, and what was written to it, along with the canonical form and content
+hash used to tell whether a meeting changed.
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from datetime import datetime
+
+from html_description import normalize_description
+
+# Event fields covered by the content hash
+CANONICAL_FIELDS = ('summary', 'start', 'end', 'description')
+
+# Private extended property of Google events holding the content hash
+HASH_PROPERTY = 'calsyncHash'
+
+
+def meeting_fingerprint(title, meeting_date, start_time_obj):
+    """
+    Identifies an Outlook meeting occurrence by its title, date and start time, so
+    that recurring meetings sharing a title are told apart.
+    """
+    return f"{title}|{meeting_date.isoformat()}|{start_time_obj.strftime('%H:%M')}"
+
+
+def canonical_meeting(title, meeting_date, start_time_obj, end_time_obj, description):
+    """
+    Returns the canonical form of a meeting's content, keyed like the Google event
+    fields it is written to.
+    """
+    return {
+        'summary': title.strip(),
+        'start': f"{meeting_date.isoformat()}T{start_time_obj.strftime('%H:%M')}",
+        'end': f"{meeting_date.isoformat()}T{end_time_obj.strftime('%H:%M')}",
+        'description': normalize_description(description, canonical=True),
+    }
+
+
+def canonical_google_event(event):
+    """Returns the canonical form of a Google Calendar event, comparable with canonical_meeting."""
+    canonical = {
+        'summary': event.get('summary', '').strip(),
+        'description': normalize_description(event.get('description', ''), canonical=True),
+    }
+    for field in ('start', 'end'):
+        date_time = event.get(field, {}).get('dateTime')
+        # Compared in the event's own offset, like the scraped (naive) times
+        canonical[field] = datetime.fromisoformat(date_time.replace('Z', '+00:00')).strftime('%Y-%m-%dT%H:%M') if date_time else None
+    return canonical
+
+
+def content_hash(canonical):
+    """Returns a hash of a canonical meeting or event."""
+    content = [canonical[field] for field in CANONICAL_FIELDS]
+    return hashlib.sha256(json.dumps(content, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def changed_fields(old, new):
+    """Returns the fields that differ between two canonical forms."""
+    return [field for field in CANONICAL_FIELDS if old.get(field) != new.get(field)]
+
+
+def stored_hash(event):
+    """Returns the content hash CalSync stored in a Google event, if any."""
+    return event.get('extendedProperties', {}).get('private', {}).get(HASH_PROPERTY)
+
+
+class SyncState:
+    """
+    Maps meeting fingerprints to the Google event id they were written to, along
+    with the content hash and etag of that write.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS synced_events (
+                fingerprint TEXT PRIMARY KEY,
+                event_id TEXT NOT NULL,
+                content_hash TEXT,
+                etag TEXT,
+                synced_at REAL
+            )
+        """)
+        self._db.commit()
+
+    def get(self, fingerprint):
+        """Returns the stored row for a fingerprint, or None."""
+        return self._db.execute(
+            "SELECT * FROM synced_events WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+
+    def record(self, fingerprint, event_id, content_hash, etag):
+        self._db.execute(
+            "INSERT OR REPLACE INTO synced_events (fingerprint, event_id, content_hash, etag, synced_at) VALUES (?, ?, ?, ?, ?)",
+            (fingerprint, event_id, content_hash, etag, time.time()),
+        )
+
+    def forget(self, fingerprint):
+        self._db.execute("DELETE FROM synced_events WHERE fingerprint = ?", (fingerprint,))
+
+    def close(self):
+        self._db.commit()
+        self._db.close()